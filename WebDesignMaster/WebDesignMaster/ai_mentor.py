@@ -1,7 +1,14 @@
 import os
 import json
+import logging
+import threading
+import time
 import requests
 from typing import Dict, Any, Optional
+from docs_index import get_docs_library
+from metrics import metrics
+
+logger = logging.getLogger(__name__)
 
 
 class AIMentor:
@@ -22,8 +29,7 @@ class AIMentor:
         self.current_key_index = 0
         self.api_key = self.api_keys[0] if self.api_keys else "sk-or-v1-fallback-key"
 
-        # Debug: Print which key is being used (remove in production)
-        print(f"Using API key: {self.api_key[:20]}..." if self.api_key else "No API key found")
+        logger.debug(f"{len(self.api_keys)} API keys configured")
         self.base_url = "https://openrouter.ai/api/v1"
 
         # Try different free models as alternatives
@@ -35,6 +41,10 @@ class AIMentor:
         self.current_model_index = 0
         self.model = self.models[0]
 
+        # Requests run concurrently (grammar analysis fans out per paragraph),
+        # so the rotation state is read and advanced under a lock
+        self._rotation_lock = threading.Lock()
+
         # Core mentor instructions
         self.system_prompt = """You are an AI coding mentor designed to assist users in learning and writing code without directly providing complete solutions. Your behavior should mimic that of a helpful friend who guides users step-by-step, explains concepts clearly, and helps with logic and problem-solving.
 
@@ -84,11 +94,17 @@ Your goal is to empower users to write code on their own while being a supportiv
 
     def get_response(self,
                      user_input: str,
-                     conversation_history: list = None) -> Dict[str, Any]:
+                     conversation_history: list = None,
+                     context_message: Dict[str, str] = None) -> Dict[str, Any]:
         """Get AI mentor response from OpenRouter API"""
         try:
+            # One consistent key and model for this request, whatever other requests rotate to
+            with self._rotation_lock:
+                key_index, api_key = self.current_key_index, self.api_key
+                model_index, model = self.current_model_index, self.model
+
             headers = {
-                "Authorization": f"Bearer {self.api_key}",
+                "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json",
                 "HTTP-Referer": "https://localhost:5000",
                 "X-Title": "CodeMentor AI"
@@ -96,6 +112,10 @@ Your goal is to empower users to write code on their own while being a supportiv
 
             messages = [{"role": "system", "content": self.system_prompt}]
 
+            # Earlier turns retrieved for relevance, ahead of the recent ones
+            if context_message:
+                messages.append(context_message)
+
             # Add conversation history if provided
             if conversation_history:
                 messages.extend(conversation_history[-4:]
@@ -105,7 +125,7 @@ Your goal is to empower users to write code on their own while being a supportiv
             messages.append({"role": "user", "content": user_input})
 
             payload = {
-                "model": self.model,
+                "model": model,
                 "messages": messages,
                 "temperature":
                 0.6,  # Slightly reduced for more consistent responses
@@ -114,17 +134,29 @@ Your goal is to empower users to write code on their own while being a supportiv
                 "frequency_penalty": 0.2
             }
 
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30  # Reduced timeout
-            )
-
-            print(f"API Response Status: {response.status_code}")
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                response = requests.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=headers,
+                    json=payload,
+                    timeout=30  # Reduced timeout
+                )
+                status = response.status_code
+            finally:
+                # Keys are labelled by position so no key material reaches /metrics
+                metrics.observe('llm_request_duration_seconds', time.perf_counter() - started,
+                                model=model, key=key_index, status=status)
+
+            logger.debug(f"API response status {response.status_code} from {model}")
 
             if response.status_code == 200:
                 data = response.json()
+                usage = data.get("usage") or {}
+                for kind in ("prompt", "completion"):
+                    if usage.get(f"{kind}_tokens"):
+                        metrics.inc('llm_tokens_total', usage[f"{kind}_tokens"], model=model, kind=kind)
                 if "choices" in data and len(data["choices"]) > 0:
                     mentor_response = data["choices"][0]["message"]["content"]
 
@@ -145,7 +177,9 @@ Your goal is to empower users to write code on their own while being a supportiv
                         is_learning_mode,
                         "suggested_topic":
                         self._extract_topic(structured_response)
-                        if is_learning_mode else None
+                        if is_learning_mode else None,
+                        "tokens":
+                        usage.get("total_tokens", 0)
                     }
                 else:
                     return {
@@ -158,8 +192,8 @@ Your goal is to empower users to write code on their own while being a supportiv
                     }
             elif response.status_code == 429:
                 # Try different model if rate limited
-                if self._rotate_model():
-                    return self.get_response(user_input, conversation_history)
+                if self._rotate_model(model_index):
+                    return self.get_response(user_input, conversation_history, context_message)
                 # Enhanced rate limit handling
                 return {
                     "success":
@@ -170,8 +204,8 @@ Your goal is to empower users to write code on their own while being a supportiv
                 }
             elif response.status_code == 401:
                 # Try next API key if available
-                if self._rotate_api_key():
-                    return self.get_response(user_input, conversation_history)
+                if self._rotate_api_key(key_index):
+                    return self.get_response(user_input, conversation_history, context_message)
                 return {
                     "success":
                     False,
@@ -356,44 +390,35 @@ Your goal is to empower users to write code on their own while being a supportiv
 
         return conversational
 
-    def _rotate_api_key(self) -> bool:
-        """Rotate to next available API key"""
-        if self.current_key_index < len(self.api_keys) - 1:
-            self.current_key_index += 1
-            self.api_key = self.api_keys[self.current_key_index]
-            print(f"Rotated to API key index: {self.current_key_index}")
-            return True
-        return False
-
-    def _rotate_model(self) -> bool:
-        """Rotate to next available model"""
-        if self.current_model_index < len(self.models) - 1:
-            self.current_model_index += 1
-            self.model = self.models[self.current_model_index]
-            print(f"Rotated to model: {self.model}")
-            return True
-        return False
+    def _rotate_api_key(self, failed: int) -> bool:
+        """Rotate past the API key at index failed; False when no later key is left"""
+        with self._rotation_lock:
+            # Only the first request to see this key fail moves on from it
+            if self.current_key_index == failed and failed < len(self.api_keys) - 1:
+                self.current_key_index += 1
+                self.api_key = self.api_keys[self.current_key_index]
+                print(f"Rotated to API key index: {self.current_key_index}")
+            return self.current_key_index > failed
+
+    def _rotate_model(self, failed: int) -> bool:
+        """Rotate past the model at index failed; False when no later model is left"""
+        with self._rotation_lock:
+            if self.current_model_index == failed and failed < len(self.models) - 1:
+                self.current_model_index += 1
+                self.model = self.models[self.current_model_index]
+                print(f"Rotated to model: {self.model}")
+            return self.current_model_index > failed
 
     def reset_api_key_rotation(self):
         """Reset to the first API key"""
-        self.current_key_index = 0
-        self.api_key = self.api_keys[0] if self.api_keys else "sk-or-v1-fallback-key"
-        print(f"Reset to first API key: {self.api_key[:20]}...")
+        with self._rotation_lock:
+            self.current_key_index = 0
+            self.api_key = self.api_keys[0] if self.api_keys else "sk-or-v1-fallback-key"
+        logger.debug("Reset to the first API key")
 
     def _extract_topic(self, response: str) -> Optional[str]:
         """Extract topic from response for documentation lookup"""
-        common_topics = [
-            "bubble-sort", "binary-search", "recursion", "arrays",
-            "linked-lists", "stacks", "queues", "trees", "graphs", "sorting",
-            "searching"
-        ]
-
-        response_lower = response.lower()
-        for topic in common_topics:
-            if topic.replace("-",
-                             " ") in response_lower or topic in response_lower:
-                return topic
-        return None
+        return get_docs_library().extract_topic(response)
 
     def analyze_code(self,
                      code: str,
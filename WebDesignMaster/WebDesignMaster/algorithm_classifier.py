@@ -0,0 +1,327 @@
+import ast
+import re
+from typing import Dict, Optional, Set
+
+from code_extraction import MAX_SOURCE_CHARS
+
+# Identifier fragments that hint at a specific algorithm
+HINT_WORDS = {
+    'bubble', 'selection', 'insertion', 'merge', 'mergesort', 'quick', 'quicksort',
+    'partition', 'pivot', 'binary', 'linear', 'search', 'mid', 'middle', 'min',
+    'smallest', 'minimum', 'key'
+}
+
+# Loop bounds that mark a binary search range
+RANGE_NAMES = {'left', 'right', 'low', 'high', 'lo', 'hi', 'start', 'end', 'l', 'r', 'first', 'last'}
+
+SORTING_ALGORITHMS = {'bubble_sort', 'selection_sort', 'insertion_sort', 'merge_sort', 'quick_sort'}
+SEARCHING_ALGORITHMS = {'binary_search', 'linear_search'}
+
+# Rule table: label -> ((feature, weight), ...) and the score needed to match.
+# Rules are checked in this order and the highest score wins; ties keep the
+# earlier rule.
+RULES = (
+    ('insertion_sort', (('shift_assign', 4), ('key_insert', 3), ('while_in_for', 2),
+                        ('adjacent_swap_in_while', 4), ('hint_insertion', 3)), 6),
+    ('bubble_sort', (('adjacent_compare', 3), ('adjacent_swap', 3), ('nested_loops', 2),
+                     ('swapped_flag', 1), ('hint_bubble', 3), ('shift_assign', -4),
+                     ('adjacent_swap_in_while', -4)), 6),
+    ('selection_sort', (('index_tracking', 4), ('nested_loops', 2), ('any_swap', 2),
+                        ('hint_selection', 3), ('hint_min', 1)), 6),
+    ('merge_sort', (('multi_recursion', 3), ('midpoint', 2), ('slice_halves', 2),
+                    ('merge_loop', 3), ('hint_merge', 3)), 6),
+    ('quick_sort', (('pivot', 3), ('partition', 3), ('multi_recursion', 2),
+                    ('hint_quick', 3)), 5),
+    ('binary_search', (('midpoint', 3), ('range_update', 3), ('has_while', 1),
+                       ('target_equality', 1), ('hint_binary', 3), ('nested_loops', -3)), 6),
+    ('linear_search', (('target_equality', 3), ('return_in_loop', 2), ('single_loop', 1),
+                       ('hint_linear', 3), ('hint_search', 1), ('midpoint', -4),
+                       ('any_swap', -3)), 5),
+)
+
+# Used when the code does not parse (other languages, half-typed code)
+HINT_ONLY_RULES = (
+    ('insertion_sort', 'insertion'),
+    ('bubble_sort', 'bubble'),
+    ('selection_sort', 'selection'),
+    ('merge_sort', 'merge'),
+    ('quick_sort', 'quick'),
+    ('binary_search', 'binary'),
+    ('linear_search', 'linear'),
+)
+
+_IDENTIFIER = re.compile(r'[A-Za-z_][A-Za-z0-9_]*')
+
+
+def _hint_words(names) -> Set[str]:
+    words = set()
+    for name in names:
+        lowered = name.lower()
+        if lowered in HINT_WORDS:
+            words.add(lowered)
+        for part in lowered.split('_'):
+            if part in HINT_WORDS:
+                words.add(part)
+        # camelCase names such as bubbleSort
+        for part in re.findall(r'[a-z]+', re.sub(r'([A-Z])', r' \1', name).lower()):
+            if part in HINT_WORDS:
+                words.add(part)
+    return words
+
+
+def _index_offset(node) -> Optional[tuple]:
+    """Describe a subscript index as (name, offset): i -> ('i', 0), j + 1 -> ('j', 1)"""
+    if isinstance(node, ast.Name):
+        return node.id, 0
+    if isinstance(node, ast.BinOp) and isinstance(node.left, ast.Name) and isinstance(node.right, ast.Constant) \
+            and isinstance(node.right.value, int):
+        if isinstance(node.op, ast.Add):
+            return node.left.id, node.right.value
+        if isinstance(node.op, ast.Sub):
+            return node.left.id, -node.right.value
+    return None
+
+
+def _subscript_parts(node) -> Optional[tuple]:
+    """(base name, (index name, offset)) for subscripts like arr[j + 1]"""
+    if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name):
+        offset = _index_offset(node.slice)
+        if offset:
+            return node.value.id, offset
+    return None
+
+
+def _adjacent(a, b) -> bool:
+    """True for arr[j] / arr[j + 1] style pairs on the same list"""
+    pa, pb = _subscript_parts(a), _subscript_parts(b)
+    return bool(pa and pb and pa[0] == pb[0] and pa[1][0] == pb[1][0] and abs(pa[1][1] - pb[1][1]) == 1)
+
+
+def _is_midpoint(node) -> bool:
+    """(a + b) // 2, a + (b - a) // 2, len(x) // 2 and the >> 1 variants"""
+    if isinstance(node, ast.BinOp):
+        halves = (isinstance(node.op, (ast.FloorDiv, ast.Div)) and isinstance(node.right, ast.Constant)
+                  and node.right.value == 2) or (isinstance(node.op, ast.RShift) and isinstance(node.right, ast.Constant)
+                                                 and node.right.value == 1)
+        if halves:
+            return True
+        return _is_midpoint(node.left) or _is_midpoint(node.right)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'int' and node.args:
+        return _is_midpoint(node.args[0])
+    return False
+
+
+class _FeatureVisitor(ast.NodeVisitor):
+    """Collect every feature in a single walk of the tree"""
+
+    def __init__(self):
+        self.features: Dict[str, int] = dict.fromkeys(
+            ('adjacent_compare', 'adjacent_swap', 'adjacent_swap_in_while', 'any_swap', 'shift_assign',
+             'key_insert', 'while_in_for', 'swapped_flag', 'index_tracking', 'multi_recursion',
+             'midpoint', 'slice_halves', 'merge_loop', 'pivot', 'partition', 'range_update',
+             'has_while', 'target_equality', 'return_in_loop', 'nested_loops', 'single_loop'), 0)
+        self.names: Set[str] = set()
+        self.loop_stack = []  # 'for' / 'while' for each enclosing loop
+        self.loop_targets = []  # target name of each enclosing for loop
+        self.max_depth = 0
+        self.function_stack = []
+        self.self_calls: Dict[str, int] = {}
+        self.subscript_names: Set[str] = set()
+        self.mid_names: Set[str] = set()
+
+    # Structure
+
+    def visit_FunctionDef(self, node):
+        self.names.add(node.name)
+        for arg in node.args.args:
+            self.names.add(arg.arg)
+        self.function_stack.append(node.name)
+        self.generic_visit(node)
+        self.function_stack.pop()
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def _visit_loop(self, node, kind):
+        if kind == 'while':
+            self.features['has_while'] = 1
+            if 'for' in self.loop_stack:
+                self.features['while_in_for'] = 1
+        self.loop_stack.append(kind)
+        self.max_depth = max(self.max_depth, len(self.loop_stack))
+        self.generic_visit(node)
+        self.loop_stack.pop()
+
+    def visit_For(self, node):
+        self.loop_targets.append(node.target.id if isinstance(node.target, ast.Name) else None)
+        self._visit_loop(node, 'for')
+        self.loop_targets.pop()
+
+    def visit_While(self, node):
+        # Merging two runs: while i < len(left) and j < len(right)
+        if isinstance(node.test, ast.BoolOp) and isinstance(node.test.op, ast.And) and \
+                sum(isinstance(value, ast.Compare) for value in node.test.values) >= 2:
+            self.features['merge_loop'] = 1
+        self._visit_loop(node, 'while')
+
+    def visit_Return(self, node):
+        if self.loop_stack:
+            self.features['return_in_loop'] = 1
+        self.generic_visit(node)
+
+    def visit_Break(self, node):
+        if self.loop_stack:
+            self.features['return_in_loop'] = 1
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name):
+            name = node.func.id
+            if self.function_stack and name == self.function_stack[-1]:
+                self.self_calls[name] = self.self_calls.get(name, 0) + 1
+                # search(arr, target, mid + 1, high): recursive range narrowing
+                for arg in node.args:
+                    if isinstance(arg, ast.BinOp) and isinstance(arg.left, ast.Name) and \
+                            (arg.left.id in self.mid_names or 'mid' in arg.left.id.lower()):
+                        self.features['range_update'] = 1
+            if 'partition' in name.lower():
+                self.features['partition'] = 1
+        self.generic_visit(node)
+
+    # Data flow
+
+    def visit_Name(self, node):
+        self.names.add(node.id)
+
+    def visit_Attribute(self, node):
+        self.names.add(node.attr)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        if isinstance(node.slice, ast.Slice):
+            for bound in (node.slice.lower, node.slice.upper):
+                if isinstance(bound, ast.Name) and (bound.id in self.mid_names or 'mid' in bound.id.lower()):
+                    self.features['slice_halves'] = 1
+        self.generic_visit(node)
+
+    def visit_Compare(self, node):
+        operands = [node.left] + node.comparators
+        for left, op, right in zip(operands, node.ops, operands[1:]):
+            if isinstance(op, (ast.Gt, ast.Lt, ast.GtE, ast.LtE)) and _adjacent(left, right):
+                self.features['adjacent_compare'] = 1
+            if isinstance(op, ast.Eq) and self.loop_stack and (
+                    (isinstance(left, ast.Subscript) and isinstance(right, ast.Name)) or
+                    (isinstance(right, ast.Subscript) and isinstance(left, ast.Name))):
+                self.features['target_equality'] = 1
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        target = node.targets[0]
+        value = node.value
+
+        # Tuple swap: a[i], a[j] = a[j], a[i]
+        if isinstance(target, ast.Tuple) and isinstance(value, ast.Tuple) and \
+                len(target.elts) == len(value.elts) == 2:
+            self.features['any_swap'] = 1
+            if _adjacent(*target.elts):
+                self.features['adjacent_swap'] = 1
+                if self.loop_stack and self.loop_stack[-1] == 'while':
+                    self.features['adjacent_swap_in_while'] = 1
+
+        for single in node.targets:
+            self._assignment(single, value)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        self._assignment(node.target, node.value)
+        self.generic_visit(node)
+
+    def _assignment(self, target, value):
+        if isinstance(target, ast.Name):
+            name = target.id.lower()
+            if _is_midpoint(value):
+                self.features['midpoint'] = 1
+                self.mid_names.add(target.id)
+            if 'pivot' in name:
+                self.features['pivot'] = 1
+            if 'swap' in name:
+                self.features['swapped_flag'] = 1
+            # min_idx = j inside an inner loop over j
+            if len(self.loop_stack) >= 2 and isinstance(value, ast.Name) and self.loop_targets and \
+                    value.id == self.loop_targets[-1]:
+                self.features['index_tracking'] = 1
+            # low = mid + 1 / high = mid - 1
+            if name in RANGE_NAMES and isinstance(value, ast.BinOp) and isinstance(value.left, ast.Name) and \
+                    (value.left.id in self.mid_names or 'mid' in value.left.id.lower()):
+                self.features['range_update'] = 1
+            if isinstance(value, ast.Subscript):
+                self.subscript_names.add(target.id)
+
+        elif isinstance(target, ast.Subscript) and self.loop_stack:
+            # arr[j + 1] = arr[j] in a while loop: shifting elements right
+            if isinstance(value, ast.Subscript) and _adjacent(target, value) and self.loop_stack[-1] == 'while':
+                self.features['shift_assign'] = 1
+            # arr[j + 1] = key: dropping the held element into place
+            if isinstance(value, ast.Name) and value.id in self.subscript_names and \
+                    self.loop_stack[-1] == 'for' and self.features['shift_assign']:
+                self.features['key_insert'] = 1
+            # Temp-variable swap: arr[j] = temp
+            if isinstance(value, ast.Name) and value.id in self.subscript_names:
+                self.features['any_swap'] = 1
+                if 'temp' in value.id.lower() or 'tmp' in value.id.lower():
+                    parts = _subscript_parts(target)
+                    if parts and parts[1][1] != 0:
+                        self.features['adjacent_swap'] = 1
+
+    def finish(self) -> Dict[str, int]:
+        features = self.features
+        features['nested_loops'] = int(self.max_depth >= 2)
+        features['single_loop'] = int(self.max_depth == 1)
+        features['multi_recursion'] = int(any(count >= 2 for count in self.self_calls.values()))
+        if any(count >= 1 for count in self.self_calls.values()) and features['midpoint']:
+            features['multi_recursion'] = 1
+
+        hints = _hint_words(self.names)
+        features['pivot'] = features['pivot'] or int('pivot' in hints)
+        features['partition'] = features['partition'] or int('partition' in hints)
+        features['hint_bubble'] = int('bubble' in hints)
+        features['hint_selection'] = int('selection' in hints)
+        features['hint_insertion'] = int('insertion' in hints)
+        features['hint_merge'] = int(bool(hints & {'merge', 'mergesort'}))
+        features['hint_quick'] = int(bool(hints & {'quick', 'quicksort'}))
+        features['hint_binary'] = int('binary' in hints)
+        features['hint_linear'] = int('linear' in hints)
+        features['hint_search'] = int('search' in hints)
+        features['hint_min'] = int(bool(hints & {'min', 'smallest', 'minimum'}))
+        return features
+
+
+def extract_features(code: str) -> Optional[Dict[str, int]]:
+    """Parse code once and return its feature vector, or None if it is not valid Python
+    or too large or deeply nested to analyse"""
+    if len(code) > MAX_SOURCE_CHARS:
+        return None
+    try:
+        tree = ast.parse(code)
+        visitor = _FeatureVisitor()
+        visitor.visit(tree)
+    except (SyntaxError, ValueError, RecursionError, MemoryError):
+        return None
+    return visitor.finish()
+
+
+def classify_algorithm(code: str) -> Optional[str]:
+    """Name of the sorting or searching algorithm the code implements, if any"""
+    features = extract_features(code)
+
+    if features is None:
+        hints = _hint_words(_IDENTIFIER.findall(code[:MAX_SOURCE_CHARS]))
+        for label, word in HINT_ONLY_RULES:
+            if word in hints:
+                return label
+        return None
+
+    best_label, best_score = None, 0
+    for label, weights, threshold in RULES:
+        score = sum(features[feature] * weight for feature, weight in weights)
+        if score >= threshold and score > best_score:
+            best_label, best_score = label, score
+    return best_label
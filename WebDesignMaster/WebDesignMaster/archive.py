@@ -0,0 +1,313 @@
+import hashlib
+import json
+import os
+import tempfile
+import uuid
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from models import Interaction
+
+try:
+    import zstandard
+except ImportError:
+    # zlib segments only
+    zstandard = None
+
+# Interactions older than this many days move out of the database
+RETENTION_DAYS = int(os.environ.get('RETENTION_DAYS', 90))
+
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'instance', 'archive'))
+
+# Rows read, written and deleted per transaction; bounds memory use
+ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 5000))
+
+ARCHIVE_CODEC = os.environ.get('ARCHIVE_CODEC', 'zstd' if zstandard is not None else 'zlib')
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 19
+CODEC_EXTENSIONS = {'zlib': '.ndjson.z', 'zstd': '.ndjson.zst'}
+
+COUNTERS = ('interaction_count', 'learn_count', 'code_count', 'tokens_used')
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return zlib.compress(data, ZLIB_LEVEL)
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst archive segments")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def body_hash(body: str) -> str:
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+
+
+def _write_atomic(path: str, data: bytes):
+    directory = os.path.dirname(path)
+    handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(handle, 'wb') as temp:
+            temp.write(data)
+            temp.flush()
+            os.fsync(temp.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+class InteractionArchive:
+    """Append-only archive of old interactions.
+
+    Each archival batch becomes one compressed NDJSON segment per month.
+    Segments are never rewritten. Response bodies are stored once by content
+    hash, in the first segment that needed them. index.json lists the
+    segments, the sessions in each with their counters, and where every body
+    lives.
+
+    A batch's segments are pending until its rows are deleted from the
+    database, then committed. recover() settles batches interrupted in
+    between: committed if their rows are gone, otherwise discarded, since
+    those rows will be archived again. Only committed segments count towards
+    session_totals() and stats().
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR, codec: str = ARCHIVE_CODEC):
+        self.root = root
+        self.codec = codec
+        self.index_path = os.path.join(root, 'index.json')
+        self.index = {'version': 1, 'segments': [], 'bodies': {}}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as handle:
+                self.index = json.load(handle)
+
+    def _save_index(self):
+        _write_atomic(self.index_path, json.dumps(self.index, separators=(',', ':')).encode('utf-8'))
+
+    def write_segment(self, month: str, rows: List[Dict[str, Any]], batch: Optional[str] = None) -> Dict[str, Any]:
+        """Store rows created in month as a new segment and record it in the index.
+
+        With batch, the segment stays pending until commit_batch(batch).
+        """
+        os.makedirs(self.root, exist_ok=True)
+        sequence = sum(1 for segment in self.index['segments'] if segment['month'] == month)
+        name = f"interactions-{month}-{sequence:04d}{CODEC_EXTENSIONS[self.codec]}"
+
+        lines = []
+        new_bodies = {}
+        sessions: Dict[str, List[Any]] = {}
+        for row in rows:
+            digest = body_hash(row['mentor_response'])
+            if digest not in self.index['bodies'] and digest not in new_bodies:
+                lines.append(json.dumps({'body_hash': digest, 'body': row['mentor_response']}))
+                new_bodies[digest] = name
+            created_at = row['created_at'].isoformat() if row['created_at'] else None
+            lines.append(json.dumps({
+                'id': row['id'],
+                'session_id': row['session_id'],
+                'user_input': row['user_input'],
+                'response_hash': digest,
+                'interaction_type': row['interaction_type'],
+                'tokens_used': row.get('tokens_used'),
+                'created_at': created_at
+            }))
+
+            totals = sessions.setdefault(row['session_id'], [0, 0, 0, 0, None])
+            totals[0] += 1
+            totals[1] += row['interaction_type'] == 'learn'
+            totals[2] += row['interaction_type'] == 'code'
+            totals[3] += row.get('tokens_used') or 0
+            if created_at and (totals[4] is None or created_at > totals[4]):
+                totals[4] = created_at
+
+        raw = ('\n'.join(lines) + '\n').encode('utf-8')
+        data = compress(raw, self.codec)
+        _write_atomic(os.path.join(self.root, name), data)
+
+        segment = {
+            'name': name,
+            'month': month,
+            'codec': self.codec,
+            'count': len(rows),
+            'first_id': min(row['id'] for row in rows),
+            'last_id': max(row['id'] for row in rows),
+            'raw_bytes': len(raw),
+            'stored_bytes': len(data),
+            'sessions': sessions,
+            'batch': batch,
+            'state': 'pending' if batch else 'committed'
+        }
+        self.index['segments'].append(segment)
+        self.index['bodies'].update(new_bodies)
+        self._save_index()
+        return segment
+
+    def commit_batch(self, batch: str):
+        """Mark a batch's segments committed once its rows are deleted from the database"""
+        self._settle({batch: 'committed'})
+
+    def _settle(self, states: Dict[str, str]):
+        for segment in self.index['segments']:
+            if segment.get('state') == 'pending' and segment.get('batch') in states:
+                segment['state'] = states[segment['batch']]
+        self._save_index()
+
+    def recover(self, connection) -> Dict[str, int]:
+        """Settle batches left pending by an interrupted run; returns how many went each way"""
+        pending: Dict[str, List[Dict[str, Any]]] = {}
+        for segment in self.index['segments']:
+            if segment.get('state') == 'pending':
+                pending.setdefault(segment['batch'], []).append(segment)
+        if not pending:
+            return {'committed': 0, 'discarded': 0}
+
+        table = Interaction.__table__
+        states = {}
+        for batch, segments in pending.items():
+            ids = [entry['id'] for segment in segments for entry in self._read_segment(segment) if 'id' in entry]
+            # A batch's rows are deleted in one transaction: any left means it never committed
+            remaining = 0
+            for offset in range(0, len(ids), 500):
+                remaining += connection.execute(select(func.count()).select_from(table).where(
+                    table.c.id.in_(ids[offset:offset + 500]))).scalar()
+            states[batch] = 'discarded' if remaining else 'committed'
+        self._settle(states)
+        return {state: sum(1 for value in states.values() if value == state) for state in ('committed', 'discarded')}
+
+    def _committed(self) -> List[Dict[str, Any]]:
+        # Segments from before batches were tracked have no state and are committed
+        return [segment for segment in self.index['segments'] if segment.get('state', 'committed') == 'committed']
+
+    def _read_segment(self, segment: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with open(os.path.join(self.root, segment['name']), 'rb') as handle:
+            raw = decompress(handle.read(), segment.get('codec', 'zlib'))
+        return [json.loads(line) for line in raw.decode('utf-8').splitlines() if line]
+
+    def iter_interactions(self, session_id: Optional[str] = None,
+                          start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Archived interactions, oldest segment first, with their response bodies.
+
+        start and end are ISO dates or datetimes; end is exclusive.
+        """
+        segments_by_name = {segment['name']: segment for segment in self.index['segments']}
+        bodies: Dict[str, str] = {}
+        loaded = set()
+        seen = set()
+
+        def load_bodies(segment, entries):
+            for entry in entries:
+                if 'body_hash' in entry:
+                    bodies[entry['body_hash']] = entry['body']
+            loaded.add(segment['name'])
+
+        for segment in self.index['segments']:
+            if session_id is not None and session_id not in segment['sessions']:
+                continue
+            if (start and segment['month'] < start[:7]) or (end and segment['month'] > end[:7]):
+                continue
+
+            entries = self._read_segment(segment)
+            load_bodies(segment, entries)
+            for entry in entries:
+                if 'body_hash' in entry or entry['id'] in seen:
+                    # Rows archived twice after an interrupted run appear once
+                    continue
+                if session_id is not None and entry['session_id'] != session_id:
+                    continue
+                if (start and (entry['created_at'] or '') < start) or (end and (entry['created_at'] or '') >= end):
+                    continue
+                seen.add(entry['id'])
+
+                digest = entry.pop('response_hash')
+                if digest not in bodies:
+                    home = segments_by_name[self.index['bodies'][digest]]
+                    if home['name'] not in loaded:
+                        load_bodies(home, self._read_segment(home))
+                entry['mentor_response'] = bodies[digest]
+                yield entry
+
+    def session_totals(self) -> Dict[str, Dict[str, Any]]:
+        """Counters of every archived session, in the shape of the session row.
+
+        Call recover() first so that interrupted batches are settled.
+        """
+        totals: Dict[str, Dict[str, Any]] = {}
+        for segment in self._committed():
+            for session_id, (count, learn, code, tokens, last) in segment['sessions'].items():
+                current = totals.setdefault(session_id, {**dict.fromkeys(COUNTERS, 0), 'last_activity_at': None})
+                for name, value in zip(COUNTERS, (count, learn, code, tokens)):
+                    current[name] += value
+                if last:
+                    last = datetime.fromisoformat(last)
+                    if current['last_activity_at'] is None or last > current['last_activity_at']:
+                        current['last_activity_at'] = last
+        return totals
+
+    def stats(self) -> Dict[str, Any]:
+        segments = self._committed()
+        return {
+            'segments': len(segments),
+            'interactions': sum(segment['count'] for segment in segments),
+            'unique_bodies': len(self.index['bodies']),
+            'raw_bytes': sum(segment['raw_bytes'] for segment in segments),
+            'stored_bytes': sum(segment['stored_bytes'] for segment in segments)
+        }
+
+
+def archive_interactions(connection, archive: InteractionArchive,
+                         older_than_days: int = RETENTION_DAYS,
+                         batch_size: int = ARCHIVE_BATCH_SIZE,
+                         now: Optional[datetime] = None,
+                         dry_run: bool = False) -> Dict[str, int]:
+    """Move interactions older than older_than_days from the database into archive.
+
+    Each batch is written to its segments before its rows are deleted and
+    committed, so a crash can leave rows both archived and in the table but
+    never lose one. The batch's segments stay pending until the delete
+    commits; the next run settles them (see InteractionArchive.recover),
+    archives any remaining rows again and readers skip the duplicates.
+    """
+    table = Interaction.__table__
+    cutoff = (now or datetime.utcnow()) - timedelta(days=older_than_days)
+    query = select(table).where(table.c.created_at < cutoff).order_by(table.c.id)
+
+    if dry_run:
+        count = connection.execute(select(func.count()).select_from(table).where(table.c.created_at < cutoff)).scalar()
+        return {'archived': count, 'segments': 0}
+
+    archive.recover(connection)
+
+    archived = 0
+    segments = 0
+    while True:
+        rows = [dict(row) for row in connection.execute(query.limit(batch_size)).mappings()]
+        if not rows:
+            break
+
+        by_month: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            by_month.setdefault(row['created_at'].strftime('%Y-%m'), []).append(row)
+        batch = uuid.uuid4().hex
+        for month, month_rows in sorted(by_month.items()):
+            archive.write_segment(month, month_rows, batch=batch)
+            segments += 1
+
+        ids = [row['id'] for row in rows]
+        for offset in range(0, len(ids), 500):
+            connection.execute(table.delete().where(table.c.id.in_(ids[offset:offset + 500])))
+        connection.commit()
+        archive.commit_batch(batch)
+        archived += len(rows)
+
+    return {'archived': archived, 'segments': segments}
@@ -0,0 +1,297 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+from typing import Any, Dict, Optional
+
+try:
+    import brotli
+except ImportError:
+    # gzip variants only
+    brotli = None
+
+# Text assets worth compressing; images like PNG are already compressed
+COMPRESSIBLE_EXTENSIONS = {'.js', '.css', '.svg', '.json', '.html', '.txt', '.map'}
+GZIP_LEVEL = int(os.environ.get('ASSET_GZIP_LEVEL', 9))
+BROTLI_QUALITY = int(os.environ.get('ASSET_BROTLI_QUALITY', 11))
+
+# Hashed names never change content, so clients may cache them for a year
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Characters after which a '/' starts a regular expression rather than a division
+_REGEX_PRECEDERS = set('(,=:[!&|?{;+-*%<>~^')
+_REGEX_KEYWORDS = {'return', 'typeof', 'case', 'do', 'else', 'in', 'of', 'new', 'delete', 'void',
+                   'throw', 'yield', 'await', 'instanceof'}
+
+
+def _skip_string(src: str, i: int) -> int:
+    """Index just past the quoted string starting at i"""
+    quote = src[i]
+    i += 1
+    while i < len(src):
+        if src[i] == '\\':
+            i += 2
+            continue
+        if src[i] == quote or src[i] == '\n':
+            return i + 1
+        i += 1
+    return i
+
+
+def _skip_template(src: str, i: int) -> int:
+    """Index just past the template literal starting at i, including ${} expressions"""
+    i += 1
+    while i < len(src):
+        char = src[i]
+        if char == '\\':
+            i += 2
+        elif char == '`':
+            return i + 1
+        elif src.startswith('${', i):
+            i = _skip_expression(src, i + 2)
+        else:
+            i += 1
+    return i
+
+
+def _skip_expression(src: str, i: int) -> int:
+    """Index just past the '}' closing a template ${ expression that starts at i"""
+    depth = 0
+    while i < len(src):
+        char = src[i]
+        if char in '"\'':
+            i = _skip_string(src, i)
+            continue
+        if char == '`':
+            i = _skip_template(src, i)
+            continue
+        if char == '{':
+            depth += 1
+        elif char == '}':
+            if depth == 0:
+                return i + 1
+            depth -= 1
+        i += 1
+    return i
+
+
+def _skip_regex(src: str, i: int) -> int:
+    """Index just past the closing '/' of the regex literal starting at i"""
+    i += 1
+    in_class = False
+    while i < len(src):
+        char = src[i]
+        if char == '\\':
+            i += 2
+            continue
+        if char == '\n':
+            return i
+        if char == '[':
+            in_class = True
+        elif char == ']':
+            in_class = False
+        elif char == '/' and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def minify_js(src: str) -> str:
+    """Conservative JavaScript minifier.
+
+    Drops comments (except /*! notices) and indentation and collapses other
+    whitespace. Newlines are kept so automatic semicolon insertion is
+    unaffected, and strings, templates and regexes are copied verbatim.
+    """
+    out = []
+    i = 0
+    last = ''     # last significant character emitted
+    word = ''     # identifier or keyword ending at the last character
+    while i < len(src):
+        char = src[i]
+
+        if char in '"\'':
+            end = _skip_string(src, i)
+        elif char == '`':
+            end = _skip_template(src, i)
+        elif src.startswith('/*', i):
+            end = src.find('*/', i + 2)
+            end = len(src) if end < 0 else end + 2
+            if src.startswith('/*!', i):
+                out.append(src[i:end])
+            else:
+                # A removed comment still separates tokens
+                out.append('\n' if '\n' in src[i:end] else ' ')
+            i = end
+            continue
+        elif src.startswith('//', i):
+            end = src.find('\n', i)
+            i = len(src) if end < 0 else end
+            continue
+        elif char == '/' and (last in _REGEX_PRECEDERS or last == '' or word in _REGEX_KEYWORDS):
+            end = _skip_regex(src, i)
+        elif char.isspace():
+            end = i
+            while end < len(src) and src[end].isspace():
+                end += 1
+            if '\n' in src[i:end]:
+                while out and out[-1] == ' ':
+                    out.pop()
+                if out and out[-1] != '\n':
+                    out.append('\n')
+            elif out and out[-1] not in (' ', '\n'):
+                out.append(' ')
+            i = end
+            continue
+        else:
+            out.append(char)
+            word = word + char if (char.isalnum() or char in '_$') else ''
+            last = char
+            i += 1
+            continue
+
+        out.append(src[i:end])
+        last = src[end - 1]
+        word = ''
+        i = end
+
+    return ''.join(out).strip() + '\n'
+
+
+def minify_css(src: str) -> str:
+    """Conservative CSS minifier: drops comments and whitespace around braces, semicolons and commas"""
+    out = []
+    i = 0
+    while i < len(src):
+        char = src[i]
+        if char in '"\'':
+            end = _skip_string(src, i)
+            out.append(src[i:end])
+            i = end
+        elif src.startswith('/*', i):
+            end = src.find('*/', i + 2)
+            end = len(src) if end < 0 else end + 2
+            if src.startswith('/*!', i):
+                out.append(src[i:end])
+            i = end
+        elif char.isspace():
+            while i < len(src) and src[i].isspace():
+                i += 1
+            if out and out[-1] not in '{};,' and i < len(src) and src[i] not in '{};,':
+                out.append(' ')
+        else:
+            if char == '}' and out and out[-1] == ';':
+                out.pop()
+            if char in '{};,':
+                while out and out[-1] == ' ':
+                    out.pop()
+            out.append(char)
+            i += 1
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+def hashed_filename(filename: str, digest: str) -> str:
+    root, extension = os.path.splitext(filename)
+    return f"{root}.{digest}{extension}"
+
+
+class AssetPipeline:
+    """Minified, fingerprinted and precompressed copies of the static files.
+
+    Built once in memory on first use. Each file is served under a name that
+    embeds a hash of its content, so it can be cached forever, and has gzip
+    (and brotli, when the brotli package is installed) variants ready.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._manifest: Dict[str, str] = {}          # source name -> hashed name
+        self._assets: Dict[str, Dict[str, Any]] = {}  # hashed name -> asset
+        self._mtimes: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._built = False
+
+    def _scan(self) -> Dict[str, float]:
+        mtimes = {}
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                mtimes[os.path.relpath(path, self.root).replace(os.sep, '/')] = os.path.getmtime(path)
+        return mtimes
+
+    def _build_asset(self, filename: str) -> Dict[str, Any]:
+        extension = os.path.splitext(filename)[1].lower()
+        with open(os.path.join(self.root, filename), 'rb') as handle:
+            body = handle.read()
+
+        minify = MINIFIERS.get(extension)
+        if minify is not None:
+            body = minify(body.decode('utf-8')).encode('utf-8')
+
+        digest = hashlib.sha256(body).hexdigest()[:12]
+        asset = {
+            'name': hashed_filename(filename, digest),
+            'etag': digest,
+            'mimetype': mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+            'variants': {'identity': body}
+        }
+        if extension in COMPRESSIBLE_EXTENSIONS:
+            asset['variants']['gzip'] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+            if brotli is not None:
+                asset['variants']['br'] = brotli.compress(body, quality=BROTLI_QUALITY)
+        return asset
+
+    def build(self):
+        """(Re)build every asset under root"""
+        with self._lock:
+            mtimes = self._scan()
+            manifest = {}
+            assets = {}
+            for filename in sorted(mtimes):
+                previous = self._manifest.get(filename)
+                if previous and self._mtimes.get(filename) == mtimes[filename]:
+                    asset = self._assets[previous]
+                else:
+                    asset = self._build_asset(filename)
+                manifest[filename] = asset['name']
+                assets[asset['name']] = asset
+            self._manifest, self._assets, self._mtimes = manifest, assets, mtimes
+            self._built = True
+
+    def _ensure_built(self):
+        if not self._built:
+            self.build()
+
+    def refresh(self):
+        """Rebuild if any file under root changed; for development servers"""
+        if self._scan() != self._mtimes:
+            self.build()
+
+    def hashed_name(self, filename: str) -> str:
+        """Fingerprinted name for a static file, or the name itself if it is unknown"""
+        self._ensure_built()
+        return self._manifest.get(filename, filename)
+
+    def get(self, hashed_name: str) -> Optional[Dict[str, Any]]:
+        self._ensure_built()
+        return self._assets.get(hashed_name)
+
+    def stats(self) -> dict:
+        self._ensure_built()
+        sizes = {}
+        for asset in self._assets.values():
+            for encoding, body in asset['variants'].items():
+                sizes[encoding] = sizes.get(encoding, 0) + len(body)
+        return dict(assets=len(self._assets), **{f'{encoding}_bytes': size for encoding, size in sizes.items()})
+
+
+def negotiate_variant(asset: Dict[str, Any], accept_encodings) -> str:
+    """Best encoding of asset the client accepts: brotli, then gzip, then identity"""
+    for encoding in ('br', 'gzip'):
+        if encoding in asset['variants'] and accept_encodings[encoding]:
+            return encoding
+    return 'identity'
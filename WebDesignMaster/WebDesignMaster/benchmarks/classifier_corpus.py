@@ -0,0 +1,275 @@
+"""Labelled corpus for the algorithm classifier: reports accuracy and per-call latency.
+
+Run from the project root: python benchmarks/classifier_corpus.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from algorithm_classifier import classify_algorithm  # noqa: E402
+
+CORPUS = [
+    ('bubble_sort', """
+def bubble_sort(arr):
+    n = len(arr)
+    for i in range(n):
+        for j in range(0, n - i - 1):
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+    return arr
+"""),
+    ('bubble_sort', """
+def sort_numbers(nums):
+    swapped = True
+    while swapped:
+        swapped = False
+        for k in range(len(nums) - 1):
+            if nums[k] > nums[k + 1]:
+                temp = nums[k]
+                nums[k] = nums[k + 1]
+                nums[k + 1] = temp
+                swapped = True
+"""),
+    ('bubble_sort', """
+def bubbleSort(a):
+    for i in range(len(a)):
+        for j in range(len(a) - 1 - i):
+            if a[j + 1] < a[j]:
+                a[j], a[j + 1] = a[j + 1], a[j]
+"""),
+    ('insertion_sort', """
+def insertion_sort(arr):
+    for i in range(1, len(arr)):
+        key = arr[i]
+        j = i - 1
+        while j >= 0 and key < arr[j]:
+            arr[j + 1] = arr[j]
+            j -= 1
+        arr[j + 1] = key
+"""),
+    ('insertion_sort', """
+def sort(values):
+    for i in range(1, len(values)):
+        current = values[i]
+        pos = i
+        while pos > 0 and values[pos - 1] > current:
+            values[pos] = values[pos - 1]
+            pos = pos - 1
+        values[pos] = current
+"""),
+    ('insertion_sort', """
+def insert_sort(a):
+    for i in range(1, len(a)):
+        j = i
+        while j > 0 and a[j - 1] > a[j]:
+            a[j - 1], a[j] = a[j], a[j - 1]
+            j -= 1
+"""),
+    ('selection_sort', """
+def selection_sort(arr):
+    n = len(arr)
+    for i in range(n):
+        min_idx = i
+        for j in range(i + 1, n):
+            if arr[j] < arr[min_idx]:
+                min_idx = j
+        arr[i], arr[min_idx] = arr[min_idx], arr[i]
+"""),
+    ('selection_sort', """
+def sort_list(items):
+    for start in range(len(items)):
+        smallest = start
+        for k in range(start + 1, len(items)):
+            if items[k] < items[smallest]:
+                smallest = k
+        items[start], items[smallest] = items[smallest], items[start]
+"""),
+    ('merge_sort', """
+def merge_sort(arr):
+    if len(arr) <= 1:
+        return arr
+    mid = len(arr) // 2
+    left = merge_sort(arr[:mid])
+    right = merge_sort(arr[mid:])
+    return merge(left, right)
+
+def merge(left, right):
+    result = []
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] <= right[j]:
+            result.append(left[i])
+            i += 1
+        else:
+            result.append(right[j])
+            j += 1
+    result.extend(left[i:])
+    result.extend(right[j:])
+    return result
+"""),
+    ('merge_sort', """
+def sort(a):
+    if len(a) > 1:
+        m = len(a) // 2
+        L = a[:m]
+        R = a[m:]
+        sort(L)
+        sort(R)
+        i = j = k = 0
+        while i < len(L) and j < len(R):
+            if L[i] < R[j]:
+                a[k] = L[i]
+                i += 1
+            else:
+                a[k] = R[j]
+                j += 1
+            k += 1
+"""),
+    ('quick_sort', """
+def quick_sort(arr, low, high):
+    if low < high:
+        pi = partition(arr, low, high)
+        quick_sort(arr, low, pi - 1)
+        quick_sort(arr, pi + 1, high)
+
+def partition(arr, low, high):
+    pivot = arr[high]
+    i = low - 1
+    for j in range(low, high):
+        if arr[j] <= pivot:
+            i += 1
+            arr[i], arr[j] = arr[j], arr[i]
+    arr[i + 1], arr[high] = arr[high], arr[i + 1]
+    return i + 1
+"""),
+    ('quick_sort', """
+def qs(items):
+    if len(items) <= 1:
+        return items
+    pivot = items[0]
+    smaller = [x for x in items[1:] if x < pivot]
+    larger = [x for x in items[1:] if x >= pivot]
+    return qs(smaller) + [pivot] + qs(larger)
+"""),
+    ('binary_search', """
+def binary_search(arr, target):
+    left, right = 0, len(arr) - 1
+    while left <= right:
+        mid = (left + right) // 2
+        if arr[mid] == target:
+            return mid
+        elif arr[mid] < target:
+            left = mid + 1
+        else:
+            right = mid - 1
+    return -1
+"""),
+    ('binary_search', """
+def find(nums, x):
+    lo, hi = 0, len(nums) - 1
+    while lo <= hi:
+        m = lo + (hi - lo) // 2
+        if nums[m] == x:
+            return m
+        if nums[m] < x:
+            lo = m + 1
+        else:
+            hi = m - 1
+    return None
+"""),
+    ('binary_search', """
+def search(arr, target, low, high):
+    if low > high:
+        return -1
+    mid = (low + high) // 2
+    if arr[mid] == target:
+        return mid
+    if arr[mid] > target:
+        return search(arr, target, low, mid - 1)
+    return search(arr, target, mid + 1, high)
+"""),
+    ('linear_search', """
+def linear_search(arr, target):
+    for i in range(len(arr)):
+        if arr[i] == target:
+            return i
+    return -1
+"""),
+    ('linear_search', """
+def contains(values, wanted):
+    i = 0
+    while i < len(values):
+        if values[i] == wanted:
+            return True
+        i += 1
+    return False
+"""),
+    ('linear_search', """
+numbers = [4, 8, 15, 16, 23, 42]
+target = 23
+for index in range(len(numbers)):
+    if numbers[index] == target:
+        print("Found at", index)
+        break
+"""),
+    (None, """
+def greet(name):
+    print("Hello, " + name)
+
+greet("world")
+"""),
+    (None, """
+total = 0
+for n in range(10):
+    total += n
+print(total)
+"""),
+    (None, """
+def factorial(n):
+    if n <= 1:
+        return 1
+    return n * factorial(n - 1)
+"""),
+    (None, """
+def fib(n):
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+"""),
+    ('bubble_sort', """
+function bubbleSort(arr) {
+    for (let i = 0; i < arr.length; i++) {
+        for (let j = 0; j < arr.length - i - 1; j++) {
+            if (arr[j] > arr[j + 1]) { [arr[j], arr[j + 1]] = [arr[j + 1], arr[j]]; }
+        }
+    }
+}
+"""),
+]
+
+
+def main(repeats=200):
+    correct = 0
+    for expected, code in CORPUS:
+        predicted = classify_algorithm(code)
+        if predicted == expected:
+            correct += 1
+        else:
+            first_line = code.strip().splitlines()[0]
+            print(f"MISS expected={expected} predicted={predicted}: {first_line}")
+
+    start = time.perf_counter()
+    for _ in range(repeats):
+        for _, code in CORPUS:
+            classify_algorithm(code)
+    per_call = (time.perf_counter() - start) / (repeats * len(CORPUS))
+
+    print(f"accuracy: {correct}/{len(CORPUS)} ({correct / len(CORPUS):.0%})")
+    print(f"latency:  {per_call * 1e6:.1f} us per call")
+
+
+if __name__ == '__main__':
+    main()
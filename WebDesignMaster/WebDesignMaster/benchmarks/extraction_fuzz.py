@@ -0,0 +1,57 @@
+"""Fuzz the literal/target extractor with adversarial inputs of growing size.
+
+Extraction time should grow at most linearly and flatten out once inputs hit
+MAX_SOURCE_CHARS. The regexes it replaced are timed alongside for comparison.
+
+Run from the project root: python benchmarks/extraction_fuzz.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from code_extraction import extract_literals  # noqa: E402
+
+# Two of the patterns the previous extractor ran over user code
+LEGACY_PATTERNS = [re.compile(r'if\s+.*?==\s*(\d+)'), re.compile(r'print\([^)]*(\d+)[^)]*\)')]
+
+
+def adversarial_inputs(size):
+    rng = random.Random(size)
+    return {
+        'long if line': 'if ' + 'a ' * (size // 2) + '\n',
+        'unclosed print': 'print(' + '1 ' * (size // 2),
+        'open lists': '[1, ' * (size // 4),
+        'many ifs': ('if x ' + ' ' * 40 + '\n') * (size // 46),
+        'random tokens': ''.join(rng.choice('[]()=,0123456789 abcifprnt\n') for _ in range(size)),
+    }
+
+
+def time_call(fn, *args, repeats=3):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def legacy(code):
+    for pattern in LEGACY_PATTERNS:
+        pattern.findall(code)
+
+
+def main():
+    for size in (1_000, 10_000, 100_000, 1_000_000):
+        for name, code in adversarial_inputs(size).items():
+            new = time_call(extract_literals, code)
+            old = time_call(legacy, code, repeats=1) if size <= 100_000 else None
+            old_text = f"{old * 1000:9.2f} ms" if old is not None else '   skipped'
+            print(f"{size:>9,} chars  {name:<14} extractor {new * 1000:8.2f} ms   previous regex {old_text}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Measure the cost of the run-code line budget and how fast it stops a runaway loop.
+
+Run from the project root: python benchmarks/run_budget_overhead.py
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sandbox import PYTHON_COMMAND, build_command, parse_budget_exceeded  # noqa: E402
+
+WORKLOAD = """
+total = 0
+for i in range(1_000_000):
+    total += i % 7
+print(total)
+"""
+
+RUNAWAY = """
+n = 0
+while n >= 0:
+    n += 1
+"""
+
+
+def timed(command):
+    start = time.perf_counter()
+    result = subprocess.run(command, capture_output=True, text=True, timeout=60)
+    return time.perf_counter() - start, result
+
+
+def main(repeats=3):
+    with tempfile.TemporaryDirectory() as workdir:
+        workload_path = os.path.join(workdir, 'workload.py')
+        runaway_path = os.path.join(workdir, 'runaway.py')
+        with open(workload_path, 'w') as f:
+            f.write(WORKLOAD)
+        with open(runaway_path, 'w') as f:
+            f.write(RUNAWAY)
+
+        plain = min(timed([PYTHON_COMMAND, workload_path])[0] for _ in range(repeats))
+        budgeted = min(timed(build_command(workload_path, 50_000_000))[0] for _ in range(repeats))
+        print(f"plain run:     {plain * 1000:8.1f} ms")
+        print(f"budgeted run:  {budgeted * 1000:8.1f} ms  ({budgeted / plain:.2f}x)")
+
+        for budget in (100_000, 1_000_000, 5_000_000):
+            elapsed, result = timed(build_command(runaway_path, budget))
+            details = parse_budget_exceeded(result.returncode, result.stderr)
+            print(f"runaway loop, budget {budget:>9,}: stopped after {elapsed * 1000:8.1f} ms, "
+                  f"hot line {details and details['hot_line']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Compare concurrent SQLite throughput under the old engine defaults and the tuned profile.
+
+Several processes stand in for gunicorn workers. Each one inserts
+interaction-sized rows one commit at a time and reads back a session's
+recent history for a fixed time.
+
+Run from the project root: python benchmarks/sqlite_concurrency.py [workers] [seconds]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from database import configure_engine, engine_options  # noqa: E402
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS interaction (
+    id INTEGER PRIMARY KEY,
+    session_id VARCHAR(256) NOT NULL,
+    user_input TEXT NOT NULL,
+    mentor_response TEXT NOT NULL,
+    interaction_type VARCHAR(50),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+)
+"""
+INDEX = "CREATE INDEX IF NOT EXISTS ix_interaction_session_history ON interaction (session_id, created_at, id)"
+BODY = "Let's think about this together. " * 30
+
+
+def make_engine(uri, profile):
+    if profile == 'tuned':
+        engine = create_engine(uri, **engine_options(uri))
+        configure_engine(engine)
+        return engine
+    # What app.py configured before: server-pool settings, SQLite defaults
+    return create_engine(uri, pool_recycle=300, pool_pre_ping=True)
+
+
+def worker(uri, profile, seconds, write_share, results):
+    engine = make_engine(uri, profile)
+    session_id = str(uuid.uuid4())
+    writes = reads = locked = 0
+    deadline = time.perf_counter() + seconds
+    n = 0
+    while time.perf_counter() < deadline:
+        n += 1
+        try:
+            if n % 100 < write_share:
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        "INSERT INTO interaction (session_id, user_input, mentor_response, interaction_type) "
+                        "VALUES (:session_id, :user_input, :mentor_response, 'code')"
+                    ), {'session_id': session_id, 'user_input': f"question {n}", 'mentor_response': BODY})
+                writes += 1
+            else:
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        "SELECT user_input, mentor_response FROM interaction WHERE session_id = :session_id "
+                        "ORDER BY created_at DESC LIMIT 10"
+                    ), {'session_id': session_id}).fetchall()
+                reads += 1
+        except OperationalError:
+            # "database is locked"
+            locked += 1
+    engine.dispose()
+    results.put((writes, reads, locked))
+
+
+def run(profile, workers, seconds, write_share):
+    with tempfile.TemporaryDirectory() as directory:
+        uri = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        setup = make_engine(uri, profile)
+        with setup.begin() as connection:
+            connection.execute(text(SCHEMA))
+            connection.execute(text(INDEX))
+        setup.dispose()
+
+        results = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=worker, args=(uri, profile, seconds, write_share, results))
+                     for _ in range(workers)]
+        for process in processes:
+            process.start()
+        totals = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+    writes = sum(t[0] for t in totals)
+    reads = sum(t[1] for t in totals)
+    locked = sum(t[2] for t in totals)
+    print(f"{profile:8} {write_share:3}% writes: {writes / seconds:9.1f} writes/s  {reads / seconds:9.1f} reads/s  "
+          f"{locked:5} locked errors")
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+    print(f"{workers} workers, {seconds:g}s per run")
+    for write_share in (10, 50):
+        for profile in ('default', 'tuned'):
+            run(profile, workers, seconds, write_share)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Measure worker boot: importing and creating the app, the first request, and memory.
+
+Each run is a fresh interpreter, as a new worker would be. Nothing at import
+or create_app() should touch the database or the model API, so the database
+file must not exist afterwards, nor build the docs index.
+
+Run from the project root: python benchmarks/startup_time.py [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, os, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+database_touched = os.path.exists(os.environ['BENCH_DB'])
+docs_indexed = sys.modules['docs_index']._docs_library is not None
+rss_created = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+app.test_client().get('/')
+served = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_ms': (created - imported) * 1000,
+    'first_request_ms': (served - created) * 1000,
+    'rss_after_create_mb': rss_created / 1024,
+    'rss_after_request_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'database_touched': database_touched,
+    'mentor_loaded': 'ai_mentor' in sys.modules,
+    'docs_indexed': docs_indexed
+}))
+"""
+
+
+def main(runs=5):
+    samples = []
+    with tempfile.TemporaryDirectory() as directory:
+        database = os.path.join(directory, 'bench.db')
+        env = dict(os.environ, DATABASE_URL=f"sqlite:///{database}", BENCH_DB=database, LOG_LEVEL='WARNING')
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                                    capture_output=True, text=True, check=True)
+            samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+            if os.path.exists(database):
+                os.remove(database)
+
+    for key in ('import_ms', 'create_ms', 'first_request_ms', 'rss_after_create_mb', 'rss_after_request_mb'):
+        values = [sample[key] for sample in samples]
+        print(f"{key:22} median {statistics.median(values):8.1f}   min {min(values):8.1f}")
+    print(f"database touched at boot: {any(sample['database_touched'] for sample in samples)}")
+    print(f"mentor client loaded at boot: {any(sample['mentor_loaded'] for sample in samples)}")
+    print(f"docs index built at boot: {any(sample['docs_indexed'] for sample in samples)}")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
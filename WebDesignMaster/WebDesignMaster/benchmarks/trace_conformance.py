@@ -0,0 +1,84 @@
+"""Check the browser's step generators against the Python reference generators.
+
+Client-computed visualizations (trace_format='client') rely on
+static/js/trace_generators.js producing exactly the steps visualization.py
+would. This runs both over the same random inputs through node and reports
+every mismatch, along with how much smaller the client response is.
+
+Run from the project root: python benchmarks/trace_conformance.py
+"""
+import json
+import os
+import random
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from visualization import (SORTING_STEPS, binary_search_steps, linear_search_steps,  # noqa: E402
+                           normalize_input, visualization_json)
+
+GENERATORS_JS = os.path.join(ROOT, 'static', 'js', 'trace_generators.js')
+
+NODE_RUNNER = """
+const TraceGenerators = require(process.argv[1]);
+const cases = JSON.parse(require('fs').readFileSync(0, 'utf8'));
+const results = cases.map(([name, array, target]) =>
+    [...(target === null ? TraceGenerators[name](array) : TraceGenerators[name](array, target))]);
+process.stdout.write(JSON.stringify(results));
+"""
+
+
+def random_cases(seed=0, count=60):
+    rng = random.Random(seed)
+    arrays = [[], [7], [2, 1], [3, 3, 3], list(range(12)), list(range(12, 0, -1))]
+    while len(arrays) < count:
+        size = rng.randint(1, 40)
+        arrays.append([rng.randint(-20, 60) for _ in range(size)])
+
+    cases = []
+    for array in arrays:
+        for name in SORTING_STEPS:
+            cases.append((name, array, None))
+        for name in ('linear_search', 'binary_search'):
+            present = rng.choice(array) if array else 5
+            for target in (present, 999):
+                searched, target = normalize_input(name, array, target)
+                cases.append((name, searched, target))
+    return cases
+
+
+def python_steps(name, array, target):
+    if name in SORTING_STEPS:
+        return list(SORTING_STEPS[name](array))
+    generator = binary_search_steps if name == 'binary_search' else linear_search_steps
+    return list(generator(array, target))
+
+
+def main():
+    cases = random_cases()
+    completed = subprocess.run(['node', '-e', NODE_RUNNER, GENERATORS_JS], input=json.dumps(cases),
+                               capture_output=True, text=True, check=True)
+    js_results = json.loads(completed.stdout)
+
+    mismatches = 0
+    for (name, array, target), js_steps in zip(cases, js_results):
+        expected = python_steps(name, array, target)
+        if expected != js_steps:
+            mismatches += 1
+            first = next((i for i, (a, b) in enumerate(zip(expected, js_steps)) if a != b),
+                         min(len(expected), len(js_steps)))
+            print(f"MISMATCH {name} array={array} target={target} at step {first}")
+
+    print(f"conformance: {len(cases) - mismatches}/{len(cases)} traces identical")
+
+    array = list(range(40, 0, -1))
+    delta = len(visualization_json('bubble_sort', array, trace_format='delta'))
+    client = len(visualization_json('bubble_sort', array, trace_format='client'))
+    print(f"reversed 40-element bubble sort: delta {delta:,} bytes, client spec {client:,} bytes")
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
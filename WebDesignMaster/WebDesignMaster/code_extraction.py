@@ -0,0 +1,151 @@
+import io
+import tokenize
+from typing import List, Optional, Tuple
+
+# Hard limits so extraction cost is bounded however much code is pasted
+MAX_SOURCE_CHARS = 50_000
+MAX_ARRAY_LENGTH = 500
+MAX_ARRAYS = 16
+
+# Variables that usually hold the value being searched for, most specific first
+TARGET_NAMES = ('target', 'search_for', 'find', 'key', 'value', 'x', 'num', 'element')
+
+# Calls like search(arr, 5) whose second argument is the target
+SEARCH_CALLS = ('search', 'find', 'locate')
+
+# Comparison operators in if statements, in the order they are trusted
+CONDITION_OPS = ('==', '!=', '<', '>')
+
+# Numbers too common in loop bounds and the like to be a search target
+IGNORED_NUMBERS = {0, 1, 2, 10, 100, 1000}
+
+_SKIP_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING}
+
+
+def _int_literal(text: str) -> Optional[int]:
+    return int(text) if text.isdigit() else None
+
+
+def _truncate(code: str) -> str:
+    if len(code) <= MAX_SOURCE_CHARS:
+        return code
+    # Cut at a line boundary so the tokenizer sees whole lines
+    cut = code.rfind('\n', 0, MAX_SOURCE_CHARS)
+    return code[:cut if cut > 0 else MAX_SOURCE_CHARS]
+
+
+def extract_literals(code: str) -> Tuple[List[List[int]], Optional[int]]:
+    """Pull integer list literals and the most likely search target out of code.
+
+    A single pass over the token stream: no regex backtracking and no eval.
+    Targets are ranked like this: an assignment to a target-like name, the
+    second argument of a search-like call, the last number printed, a number
+    compared against in an if statement, then the first uncommon number.
+    """
+    arrays: List[List[int]] = []
+
+    named_targets = {}       # name priority -> value
+    call_target = None
+    print_target = None
+    condition_targets = {}   # operator priority -> value
+    fallback_target = None
+
+    current_list = None      # list literal being collected, or None
+    list_ok = False
+    prev = None              # previous significant token (type, string)
+    pending_name = None      # target-like name waiting for '='
+    in_if = False
+    print_depth = None       # paren depth of an open print( call
+    search_calls = []        # [paren depth, top-level commas, last two tokens] per open search call
+    depth = 0
+
+    tokens = tokenize.generate_tokens(io.StringIO(_truncate(code)).readline)
+    try:
+        for tok_type, text, _, _, _ in tokens:
+            if tok_type in _SKIP_TOKENS:
+                continue
+
+            if tok_type == tokenize.NEWLINE:
+                in_if = False
+                pending_name = None
+                prev = None
+                continue
+
+            # List literals: '[' not preceded by something it could subscript
+            if current_list is not None:
+                if text == ']':
+                    if list_ok and current_list and len(arrays) < MAX_ARRAYS:
+                        arrays.append(current_list)
+                    current_list = None
+                elif tok_type == tokenize.NUMBER and _int_literal(text) is not None and \
+                        len(current_list) < MAX_ARRAY_LENGTH:
+                    current_list.append(int(text))
+                elif text != ',':
+                    list_ok = False
+            elif text == '[' and not (prev and (prev[0] in (tokenize.NAME, tokenize.STRING) or prev[1] in (')', ']'))):
+                current_list = []
+                list_ok = True
+
+            number = _int_literal(text) if tok_type == tokenize.NUMBER else None
+
+            # Assignments to target-like names: target = 5
+            if pending_name is not None and prev and prev[1] == '=' and number is not None:
+                named_targets.setdefault(pending_name, number)
+            if tok_type == tokenize.NAME and prev is None and text.lower() in TARGET_NAMES:
+                pending_name = TARGET_NAMES.index(text.lower())
+            elif not (text == '=' or (prev and prev[1] == '=')):
+                pending_name = None
+
+            # Numbers compared against in if statements
+            if tok_type == tokenize.NAME and text in ('if', 'elif'):
+                in_if = True
+            if in_if and number is not None and prev and prev[1] in CONDITION_OPS:
+                condition_targets.setdefault(CONDITION_OPS.index(prev[1]), number)
+
+            # Numbers printed
+            if print_depth is not None and number is not None:
+                print_target = number
+
+            if number is not None and number not in IGNORED_NUMBERS and fallback_target is None:
+                fallback_target = number
+
+            # Calls: track paren depth for print( and search-like calls
+            if text == '(':
+                depth += 1
+                if prev and prev[0] == tokenize.NAME:
+                    name = prev[1].lower()
+                    if name == 'print' and print_depth is None:
+                        print_depth = depth
+                    elif name.endswith(SEARCH_CALLS):
+                        search_calls.append([depth, 0, []])
+            elif text == ')':
+                if search_calls and search_calls[-1][0] == depth:
+                    _, commas, last = search_calls.pop()
+                    if call_target is None and commas == 1 and len(last) == 2 and last[0] == ',' \
+                            and _int_literal(last[1]) is not None:
+                        call_target = int(last[1])
+                if print_depth == depth:
+                    print_depth = None
+                depth = max(depth - 1, 0)
+            elif search_calls and search_calls[-1][0] == depth:
+                if text == ',':
+                    search_calls[-1][1] += 1
+                search_calls[-1][2] = (search_calls[-1][2] + [text])[-2:]
+
+            prev = (tok_type, text)
+    except (tokenize.TokenError, SyntaxError):
+        # Unfinished or mis-indented code: keep what was found so far
+        pass
+
+    if named_targets:
+        target = named_targets[min(named_targets)]
+    elif call_target is not None:
+        target = call_target
+    elif print_target is not None:
+        target = print_target
+    elif condition_targets:
+        target = condition_targets[min(condition_targets)]
+    else:
+        target = fallback_target
+
+    return arrays, target
@@ -0,0 +1,92 @@
+import json
+
+import click
+from flask.cli import with_appcontext
+
+from database import db
+from archive import RETENTION_DAYS, InteractionArchive, archive_interactions
+from export import EXPORT_KINDS, iter_export, parse_time, to_ndjson
+from migrations import run_migrations
+from session_stats import reconcile
+
+
+def init_db():
+    """Create missing tables and apply pending migrations; needs an app context"""
+    import models  # noqa: F401  (registers the tables)
+    db.create_all()
+    return run_migrations(db.engine)
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the database schema and bring it up to date"""
+    applied = init_db()
+    click.echo(f"Applied {len(applied)} migrations" + (f": {', '.join(applied)}" if applied else ''))
+
+
+@click.command('reconcile-stats')
+@with_appcontext
+def reconcile_stats():
+    """Recompute per-session counters from the interactions table and the archive"""
+    archive = InteractionArchive()
+    archive.recover(db.session)
+    result = reconcile(db.session, archive.session_totals())
+    db.session.commit()
+    click.echo(f"Checked {result['checked']} sessions: "
+               f"{result['corrected']} corrected, {result['created']} created")
+
+
+@click.command('archive-interactions')
+@with_appcontext
+@click.option('--days', default=RETENTION_DAYS, show_default=True, help='Archive interactions older than this')
+@click.option('--dry-run', is_flag=True, help='Only count what would be archived')
+def archive_old_interactions(days, dry_run):
+    """Move old interactions into compressed archive segments"""
+    archive = InteractionArchive()
+    result = archive_interactions(db.session, archive, older_than_days=days, dry_run=dry_run)
+    if dry_run:
+        click.echo(f"{result['archived']} interactions are older than {days} days")
+        return
+    stats = archive.stats()
+    click.echo(f"Archived {result['archived']} interactions into {result['segments']} segments; "
+               f"archive holds {stats['interactions']} interactions, {stats['unique_bodies']} unique responses, "
+               f"{stats['stored_bytes']:,} of {stats['raw_bytes']:,} bytes")
+
+
+@click.command('show-archived')
+@with_appcontext
+@click.option('--session', 'session_id', help='Only this session')
+@click.option('--start', help='ISO date or datetime, inclusive')
+@click.option('--end', help='ISO date or datetime, exclusive')
+def show_archived(session_id, start, end):
+    """Print archived interactions as NDJSON"""
+    for entry in InteractionArchive().iter_interactions(session_id, start, end):
+        click.echo(json.dumps(entry))
+
+
+@click.command('export-data')
+@with_appcontext
+@click.option('--type', 'kind', type=click.Choice(list(EXPORT_KINDS)), default='interactions', show_default=True)
+@click.option('--session', 'session_id', help='Only this session')
+@click.option('--interaction-type', help="Only interactions of this type, such as 'learn' or 'code'")
+@click.option('--since', help='ISO date or datetime, inclusive')
+@click.option('--until', help='ISO date or datetime, exclusive')
+@click.option('--after', type=int, help='Resume after this id')
+@click.option('--limit', type=int, help='Stop after this many rows and print a resume cursor')
+@click.option('--output', type=click.File('wb'), default='-', help='File to write; stdout by default')
+def export_data(kind, session_id, interaction_type, since, until, after, limit, output):
+    """Stream sessions or interactions as NDJSON"""
+    try:
+        since, until = parse_time(since), parse_time(until)
+    except ValueError:
+        raise click.BadParameter('since and until must be ISO dates')
+    records = iter_export(db.session, kind, session_id=session_id, interaction_type=interaction_type,
+                          since=since, until=until, after=after, limit=limit)
+    for line in to_ndjson(records):
+        output.write(line)
+
+
+def register_commands(app):
+    for command in (init_db_command, reconcile_stats, archive_old_interactions, show_archived, export_data):
+        app.cli.add_command(command)
@@ -0,0 +1,246 @@
+import gzip
+import itertools
+import os
+import threading
+import time
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    # gzip only
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', '1') != '0'
+
+# Bodies with a known length below this are sent as they are
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+
+# Dynamic responses favour speed over ratio
+COMPRESSION_LEVEL = int(os.environ.get('COMPRESSION_LEVEL', 6))
+BROTLI_QUALITY = int(os.environ.get('COMPRESSION_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/x-ndjson',
+                      'application/xml', 'image/svg+xml')
+
+# Server preference when the client rates encodings equally
+SUPPORTED_ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negotiate_encoding(accept_encoding: str, available: Tuple[str, ...] = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """Encoding from available the Accept-Encoding header rates highest, or None"""
+    qualities = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[name] = quality
+
+    best = None
+    best_quality = 0.0
+    for encoding in available:
+        quality = qualities.get(encoding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class _Compressor:
+    """Incremental compressor with a flush after every chunk so streams stay live"""
+
+    def __init__(self, encoding: str, level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == 'br':
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == 'br':
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """WSGI middleware that compresses compressible responses per request.
+
+    Bodies with a Content-Length are compressed in one go once they reach
+    min_size; bodies without one (streamed responses) are compressed chunk by
+    chunk. Responses that already carry a Content-Encoding, forbid
+    transformation or are not text-like pass through untouched.
+    """
+
+    def __init__(self, app,
+                 min_size: int = COMPRESSION_MIN_SIZE,
+                 level: int = COMPRESSION_LEVEL,
+                 brotli_quality: int = BROTLI_QUALITY,
+                 enabled: bool = COMPRESSION_ENABLED):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        self.enabled = enabled
+
+        self._lock = threading.Lock()
+        self.compressed = 0
+        self.skipped = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def stats(self) -> dict:
+        """Counters for how much was compressed and what it cost"""
+        with self._lock:
+            return {
+                'compressed': self.compressed,
+                'skipped': self.skipped,
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+                'seconds': round(self.seconds, 6)
+            }
+
+    def _record(self, bytes_in: int, bytes_out: int, seconds: float):
+        with self._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+            self.seconds += seconds
+
+    def _should_compress(self, status: str, headers: List[Tuple[str, str]]) -> bool:
+        code = int(status.split(' ', 1)[0])
+        if code < 200 or code in (204, 206, 304):
+            return False
+
+        values = {name.lower(): value for name, value in headers}
+        if 'content-encoding' in values or 'no-transform' in values.get('cache-control', ''):
+            return False
+        if not values.get('content-type', '').startswith(COMPRESSIBLE_TYPES):
+            return False
+
+        length = values.get('content-length')
+        return length is None or int(length) >= self.min_size
+
+    @staticmethod
+    def _encoded_headers(headers: List[Tuple[str, str]], encoding: str,
+                         length: Optional[int]) -> List[Tuple[str, str]]:
+        result = []
+        vary = None
+        for name, value in headers:
+            lower = name.lower()
+            if lower == 'content-length':
+                continue
+            if lower == 'vary':
+                vary = value
+                continue
+            if lower == 'etag' and not value.startswith('W/'):
+                # The encoded body is a different representation of the same resource
+                value = 'W/' + value
+            result.append((name, value))
+
+        result.append(('Content-Encoding', encoding))
+        if vary is None:
+            result.append(('Vary', 'Accept-Encoding'))
+        elif 'accept-encoding' not in vary.lower() and vary.strip() != '*':
+            result.append(('Vary', vary + ', Accept-Encoding'))
+        else:
+            result.append(('Vary', vary))
+        if length is not None:
+            result.append(('Content-Length', str(length)))
+        return result
+
+    def __call__(self, environ, start_response):
+        encoding = None
+        if self.enabled and environ.get('REQUEST_METHOD') != 'HEAD':
+            encoding = negotiate_encoding(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return self.app(environ, start_response)
+
+        captured = {}
+        written: List[bytes] = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'], captured['headers'], captured['exc_info'] = status, headers, exc_info
+            return written.append
+
+        body = self.app(environ, capture)
+        status, headers = captured['status'], captured['headers']
+
+        if not self._should_compress(status, headers):
+            with self._lock:
+                self.skipped += 1
+            start_response(status, headers, captured['exc_info'])
+            # Hand the original iterable back so file wrappers keep working
+            return self._passthrough(written, body) if written else body
+
+        if any(name.lower() == 'content-length' for name, _ in headers):
+            try:
+                raw = b''.join(written) + b''.join(body)
+            finally:
+                if hasattr(body, 'close'):
+                    body.close()
+
+            started = time.perf_counter()
+            if encoding == 'br':
+                encoded = brotli.compress(raw, quality=self.brotli_quality)
+            else:
+                encoded = gzip.compress(raw, compresslevel=self.level, mtime=0)
+            self._record(len(raw), len(encoded), time.perf_counter() - started)
+
+            if len(encoded) >= len(raw):
+                # Not worth it; send the original with an accurate length
+                with self._lock:
+                    self.skipped += 1
+                start_response(status, headers, captured['exc_info'])
+                return [raw]
+            with self._lock:
+                self.compressed += 1
+            start_response(status, self._encoded_headers(headers, encoding, len(encoded)), captured['exc_info'])
+            return [encoded]
+
+        with self._lock:
+            self.compressed += 1
+        start_response(status, self._encoded_headers(headers, encoding, None), captured['exc_info'])
+        return self._stream(written, body, _Compressor(encoding, self.level, self.brotli_quality))
+
+    @staticmethod
+    def _passthrough(written: List[bytes], body: Iterable[bytes]):
+        try:
+            yield from written
+            yield from body
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def _stream(self, written: List[bytes], body: Iterable[bytes], compressor: _Compressor):
+        try:
+            for data in itertools.chain(written, body):
+                if data:
+                    yield self._compress_chunk(compressor, data)
+
+            started = time.perf_counter()
+            tail = compressor.finish()
+            self._record(0, len(tail), time.perf_counter() - started)
+            yield tail
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+
+    def _compress_chunk(self, compressor: _Compressor, data: bytes) -> bytes:
+        started = time.perf_counter()
+        encoded = compressor.chunk(data)
+        self._record(len(data), len(encoded), time.perf_counter() - started)
+        return encoded
@@ -0,0 +1,96 @@
+import os
+from typing import Any, Dict
+
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import QueuePool
+
+# SQLite: readers never block the writer in WAL mode, and NORMAL only skips
+# the fsync on each commit (a power cut can lose the last commits, never
+# corrupt the file)
+SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+SQLITE_CACHE_KIB = int(os.environ.get('SQLITE_CACHE_KIB', 16 * 1024))
+
+# Connections kept open to a SQLite file, and how many more may be opened
+# under load; threads beyond that wait for a connection to come back
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', 8))
+SQLITE_MAX_OVERFLOW = int(os.environ.get('SQLITE_MAX_OVERFLOW', 16))
+
+# Server databases such as PostgreSQL
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 300))
+
+
+class Base(DeclarativeBase):
+    pass
+
+
+db = SQLAlchemy(model_class=Base)
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def is_memory_sqlite(uri: str) -> bool:
+    return is_sqlite(uri) and make_url(uri).database in (None, '', ':memory:')
+
+
+def engine_options(uri: str) -> Dict[str, Any]:
+    """SQLALCHEMY_ENGINE_OPTIONS suited to the database behind uri"""
+    if is_memory_sqlite(uri):
+        # Flask-SQLAlchemy already shares one connection for in-memory databases
+        return {}
+    if is_sqlite(uri):
+        # Connections are checked out per request and returned, so any number
+        # of threads can share them; pre-ping and recycling do nothing for a
+        # local file
+        return {
+            'poolclass': QueuePool,
+            'pool_size': SQLITE_POOL_SIZE,
+            'max_overflow': SQLITE_MAX_OVERFLOW,
+            'pool_timeout': DB_POOL_TIMEOUT,
+            'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000, 'check_same_thread': False},
+        }
+    return {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': True,
+    }
+
+
+def sqlite_pragmas() -> Dict[str, Any]:
+    return {
+        'journal_mode': SQLITE_JOURNAL_MODE,
+        'synchronous': SQLITE_SYNCHRONOUS,
+        'busy_timeout': SQLITE_BUSY_TIMEOUT_MS,
+        'mmap_size': SQLITE_MMAP_SIZE,
+        'cache_size': -SQLITE_CACHE_KIB,
+        'temp_store': 'MEMORY',
+    }
+
+
+def configure_engine(engine):
+    """Apply the SQLite connection profile to every new connection of engine"""
+    if engine.dialect.name != 'sqlite' or is_memory_sqlite(str(engine.url)):
+        return
+
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
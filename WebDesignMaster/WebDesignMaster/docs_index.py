@@ -0,0 +1,244 @@
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import Counter, deque
+from html.parser import HTMLParser
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+DOCS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'docs')
+
+# Topics the mentor may point to, most specific first. Pages in docs/ with
+# content are added after these; the library page is never suggested.
+MENTOR_TOPICS = [
+    "bubble-sort", "binary-search", "recursion", "arrays",
+    "linked-lists", "stacks", "queues", "trees", "graphs", "sorting", "searching"
+]
+UNSUGGESTED_TOPICS = {'library'}
+
+STOP_WORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'how', 'in', 'is', 'it', 'of',
+    'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'with', 'you', 'your'
+}
+
+# Term weights by where the term appears
+TITLE_WEIGHT = 3
+HEADING_WEIGHT = 2
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_TITLE_SUFFIX = re.compile(r'\s+-\s+.*$')
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class _TextExtractor(HTMLParser):
+    """Visible text of a page, split into title, headings and body"""
+
+    def __init__(self):
+        super().__init__()
+        self.title = []
+        self.headings = []
+        self.body = []
+        self._stack = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag not in ('br', 'img', 'meta', 'link', 'hr', 'input'):
+            self._stack.append(tag)
+
+    def handle_endtag(self, tag):
+        if tag in self._stack:
+            while self._stack and self._stack.pop() != tag:
+                pass
+
+    def handle_data(self, data):
+        data = ' '.join(data.split())
+        if not data or any(tag in ('script', 'style') for tag in self._stack):
+            return
+        if 'title' in self._stack:
+            self.title.append(data)
+        elif any(tag in ('h1', 'h2', 'h3') for tag in self._stack):
+            self.headings.append(data)
+        else:
+            self.body.append(data)
+
+
+class AhoCorasick:
+    """Multi-pattern matcher: finds every pattern occurring in a text in one pass"""
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, Any]]] = [[]]
+
+        for pattern, value in patterns.items():
+            state = 0
+            for char in pattern:
+                if char not in self._goto[state]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = len(self._goto) - 1
+                state = self._goto[state][char]
+            self._output[state].append((pattern, value))
+
+        # Breadth-first failure links, inheriting the outputs of the fallback state
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, str, Any]]:
+        """(start index, pattern, value) for every occurrence, in order of end position"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern, value in self._output[state]:
+                yield index - len(pattern) + 1, pattern, value
+
+
+class DocsIndex:
+    """The docs/ library held in memory with an inverted index over its text"""
+
+    def __init__(self, root: str = DOCS_DIR):
+        self.root = root
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.postings: Dict[str, Dict[str, int]] = {}   # term -> {topic: weighted frequency}
+        self.lengths: Dict[str, int] = {}
+        self.average_length = 0.0
+        self.build()
+        self.topic_matcher = self._build_topic_matcher()
+
+    def build(self):
+        for filename in sorted(os.listdir(self.root)):
+            if not filename.endswith('.html'):
+                continue
+            with open(os.path.join(self.root, filename), 'rb') as handle:
+                body = handle.read()
+
+            topic = filename[:-len('.html')]
+            page = {
+                'topic': topic,
+                'body': body,
+                'etag': hashlib.sha256(body).hexdigest()[:16],
+                'title': topic.replace('-', ' ').title(),
+                'text': ''
+            }
+            self.pages[topic] = page
+            if not body.strip():
+                # Empty placeholder pages are served but not searchable
+                continue
+
+            extractor = _TextExtractor()
+            extractor.feed(body.decode('utf-8', errors='ignore'))
+            if extractor.title:
+                page['title'] = _TITLE_SUFFIX.sub('', ' '.join(extractor.title))
+            page['text'] = ' '.join(extractor.body)
+
+            terms = Counter()
+            for token in tokenize(page['title'] + ' ' + topic.replace('-', ' ')):
+                terms[token] += TITLE_WEIGHT
+            for token in tokenize(' '.join(extractor.headings)):
+                terms[token] += HEADING_WEIGHT
+            for token in tokenize(page['text']):
+                terms[token] += 1
+
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[topic] = count
+            self.lengths[topic] = sum(terms.values())
+
+        if self.lengths:
+            self.average_length = sum(self.lengths.values()) / len(self.lengths)
+
+    def _build_topic_matcher(self) -> AhoCorasick:
+        """Phrases that name a topic, both hyphenated and spaced, ranked by priority"""
+        topics = list(MENTOR_TOPICS)
+        topics += [topic for topic in self.pages if topic not in topics and topic not in UNSUGGESTED_TOPICS
+                   and self.lengths.get(topic)]
+
+        patterns = {}
+        for priority, topic in enumerate(topics):
+            phrases = {topic, topic.replace('-', ' ')}
+            page = self.pages.get(topic)
+            if page and self.lengths.get(topic):
+                phrases.add(page['title'].lower())
+            for phrase in phrases:
+                patterns.setdefault(phrase, (priority, topic))
+        return AhoCorasick(patterns)
+
+    def get(self, topic: str) -> Optional[Dict[str, Any]]:
+        return self.pages.get(topic)
+
+    def extract_topic(self, text: str) -> Optional[str]:
+        """Highest-priority topic named anywhere in text, matched as whole words"""
+        lowered = text.lower()
+        best = None
+        for start, pattern, value in self.topic_matcher.iter_matches(lowered):
+            end = start + len(pattern)
+            if (start > 0 and lowered[start - 1].isalnum()) or (end < len(lowered) and lowered[end].isalnum()):
+                continue
+            if best is None or value < best:
+                best = value
+        return best[1] if best else None
+
+    def search(self, query: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Pages ranked by BM25 over title, heading and body terms"""
+        terms = tokenize(query)
+        scores = Counter()
+        for term in set(terms):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (len(self.lengths) - len(postings) + 0.5) / (len(postings) + 0.5))
+            for topic, frequency in postings.items():
+                norm = 1 - BM25_B + BM25_B * self.lengths[topic] / self.average_length
+                scores[topic] += idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * norm)
+
+        results = []
+        for topic, score in scores.most_common(limit):
+            page = self.pages[topic]
+            results.append({
+                'topic': topic,
+                'title': page['title'],
+                'url': f"/docs/{topic}",
+                'score': round(score, 4),
+                'snippet': self._snippet(page['text'], terms)
+            })
+        return results
+
+    @staticmethod
+    def _snippet(text: str, terms: List[str], width: int = 160) -> str:
+        lowered = text.lower()
+        positions = [match.start() for term in terms for match in [re.search(r'\b' + re.escape(term), lowered)]
+                     if match]
+        start = max(min(positions) - width // 4, 0) if positions else 0
+        snippet = text[start:start + width].strip()
+        return ('…' if start else '') + snippet + ('…' if start + width < len(text) else '')
+
+
+_docs_library: Optional[DocsIndex] = None
+_docs_lock = threading.Lock()
+
+
+def get_docs_library() -> DocsIndex:
+    """The docs index, built on first use rather than at import"""
+    global _docs_library
+    if _docs_library is None:
+        with _docs_lock:
+            if _docs_library is None:
+                _docs_library = DocsIndex()
+    return _docs_library
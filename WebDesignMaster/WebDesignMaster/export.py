@@ -0,0 +1,84 @@
+import hmac
+import json
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from sqlalchemy import select
+
+from models import Interaction, Session
+
+# Required as a bearer token by the export endpoint; unset disables it
+EXPORT_TOKEN = os.environ.get('EXPORT_TOKEN')
+
+# Rows fetched from the database cursor at a time
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 1000))
+
+EXPORT_KINDS = {'interactions': Interaction, 'sessions': Session}
+
+
+def token_allowed(header: Optional[str], token: Optional[str] = EXPORT_TOKEN) -> bool:
+    """Whether an Authorization header carries the export token"""
+    if not token or not header or not header.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(header[len('Bearer '):].encode('utf-8'), token.encode('utf-8'))
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    """ISO date or datetime, or None; raises ValueError for anything else"""
+    return datetime.fromisoformat(value) if value else None
+
+
+def iter_export(connection, kind: str,
+                session_id: Optional[str] = None,
+                interaction_type: Optional[str] = None,
+                since: Optional[datetime] = None,
+                until: Optional[datetime] = None,
+                after: Optional[int] = None,
+                limit: Optional[int] = None,
+                batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+    """Rows of kind ('interactions' or 'sessions') in id order, as plain dicts.
+
+    Rows stream through a server-side cursor batch_size at a time, so memory
+    stays flat. after is a keyset cursor: the id of the last row already
+    received. When limit cuts the export short, a final
+    {'type': 'cursor', 'after': id} record says where to resume.
+    """
+    table = EXPORT_KINDS[kind].__table__
+    query = select(table).order_by(table.c.id)
+    if session_id:
+        query = query.where(table.c.session_id == session_id)
+    if interaction_type and kind == 'interactions':
+        query = query.where(table.c.interaction_type == interaction_type)
+    if since:
+        query = query.where(table.c.created_at >= since)
+    if until:
+        query = query.where(table.c.created_at < until)
+    if after is not None:
+        query = query.where(table.c.id > after)
+    if limit is not None:
+        # One extra row tells whether there is more to resume
+        query = query.limit(limit + 1)
+
+    record_type = kind[:-1]
+    count = 0
+    last_id = after
+    result = connection.execute(query.execution_options(yield_per=batch_size))
+    try:
+        for row in result.mappings():
+            if limit is not None and count == limit:
+                yield {'type': 'cursor', 'after': last_id}
+                break
+            record = {'type': record_type}
+            for name, value in row.items():
+                record[name] = value.isoformat() if isinstance(value, datetime) else value
+            yield record
+            count += 1
+            last_id = row['id']
+    finally:
+        result.close()
+
+
+def to_ndjson(records: Iterable[Dict[str, Any]]) -> Iterator[bytes]:
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False).encode('utf-8') + b'\n'
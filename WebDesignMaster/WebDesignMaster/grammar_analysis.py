@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Tuple
+
+from cache import BoundedCache
+from spellcheck import longest_sentence
+
+# Paragraphs analyzed concurrently per request
+GRAMMAR_MAX_WORKERS = int(os.environ.get('GRAMMAR_MAX_WORKERS', 4))
+
+# Paragraphs without a sentence this long (headings, labels, code, lists of
+# terms) have no grammar for the mentor to review; the local checks cover them
+GRAMMAR_MIN_REVIEW_WORDS = int(os.environ.get('GRAMMAR_MIN_REVIEW_WORDS', 4))
+
+# Per-paragraph results keyed by a hash of the paragraph text
+paragraph_cache = BoundedCache(
+    max_entries=int(os.environ.get('GRAMMAR_CACHE_MAX_ENTRIES', 2048)),
+    ttl=float(os.environ.get('GRAMMAR_CACHE_TTL', 24 * 3600))
+)
+
+# Spelling, repeated words, sentence length and passive voice are found by the
+# local pre-check in spellcheck.py, so the prompt leaves them out
+PARAGRAPH_PROMPT = """Please check this paragraph for grammar, clarity and style. Its lines are numbered. Spelling, repeated words, sentence length and passive voice are already checked, so do not mention them.
+
+{numbered}
+
+List each problem on its own line in exactly this form:
+LINE <number> | <error, warning or info> | <what is wrong and how to fix it>
+Use error for grammar mistakes, warning for awkward or unclear sentences and info for style.
+Finish with one or two sentences of overall feedback on a line starting with SUMMARY:"""
+
+_ISSUE_LINE = re.compile(r'^\W*LINE\s+(\d+)\s*[|:\-]\s*(error|warning|info)\s*[|:\-]\s*(.+?)\s*$', re.IGNORECASE)
+_SUMMARY = re.compile(r'SUMMARY:\s*(.*)', re.IGNORECASE | re.DOTALL)
+
+
+def split_paragraphs(content: str) -> List[Tuple[int, str]]:
+    """Blank-line separated paragraphs as (first line number, text), numbered from 1"""
+    paragraphs = []
+    current: List[str] = []
+    start = 1
+
+    for number, line in enumerate(content.split('\n'), start=1):
+        if line.strip():
+            if not current:
+                start = number
+            current.append(line)
+        elif current:
+            paragraphs.append((start, '\n'.join(current)))
+            current = []
+
+    if current:
+        paragraphs.append((start, '\n'.join(current)))
+    return paragraphs
+
+
+def paragraph_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def parse_paragraph_response(text: str, line_count: int) -> Dict[str, Any]:
+    """Line-anchored issues and the summary from one paragraph's analysis"""
+    issues = []
+    for line in text.split('\n'):
+        match = _ISSUE_LINE.match(line)
+        if match:
+            # Clamp to the paragraph in case the model miscounts
+            offset = min(max(int(match.group(1)), 1), line_count)
+            issues.append({'offset': offset, 'type': match.group(2).lower(), 'message': match.group(3)})
+
+    summary = _SUMMARY.search(text)
+    if summary:
+        summary_text = summary.group(1).strip()
+    elif issues:
+        summary_text = ''
+    else:
+        summary_text = text.strip()
+    return {'issues': issues, 'summary': summary_text}
+
+
+def needs_review(text: str) -> bool:
+    """Whether a paragraph has sentences the mentor should review"""
+    if text.lstrip().startswith('```'):
+        return False
+    return longest_sentence(text) >= GRAMMAR_MIN_REVIEW_WORDS
+
+
+def analyze_paragraph(text: str, ask: Callable[[str], Dict[str, Any]]) -> Dict[str, Any]:
+    """Ask the mentor about one paragraph; results are only cached on success"""
+    lines = text.split('\n')
+    numbered = '\n'.join(f"{number}. {line}" for number, line in enumerate(lines, start=1))
+    response = ask(PARAGRAPH_PROMPT.format(numbered=numbered))
+    if not response.get('success'):
+        return {'success': False, 'error': response.get('response', 'Analysis failed')}
+
+    result = dict(parse_paragraph_response(response['response'], len(lines)), success=True)
+    paragraph_cache.set(paragraph_key(text), result)
+    return result
+
+
+def analyze_document(content: str,
+                     ask: Callable[[str], Dict[str, Any]],
+                     max_workers: int = GRAMMAR_MAX_WORKERS) -> Dict[str, Any]:
+    """Analyze a document paragraph by paragraph.
+
+    Paragraphs whose text was analyzed before come from the cache, and those
+    without sentences to review are left to the local checks; the rest are
+    sent to the mentor concurrently, so the work tracks the size of the edit
+    rather than the document. Suggestions are anchored to absolute lines.
+    """
+    paragraphs = split_paragraphs(content)
+
+    results: Dict[str, Dict[str, Any]] = {}
+    pending: Dict[str, str] = {}
+    local_only = 0
+    for _, text in paragraphs:
+        key = paragraph_key(text)
+        if key in results or key in pending:
+            continue
+        if not needs_review(text):
+            results[key] = {'success': True, 'issues': [], 'summary': ''}
+            local_only += 1
+            continue
+        cached = paragraph_cache.get(key)
+        if cached is not None:
+            results[key] = cached
+        else:
+            pending[key] = text
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(pending)))) as executor:
+            futures = {key: executor.submit(analyze_paragraph, text, ask) for key, text in pending.items()}
+            for key, future in futures.items():
+                results[key] = future.result()
+
+    suggestions = []
+    summaries = []
+    errors = []
+    for start, text in paragraphs:
+        result = results[paragraph_key(text)]
+        if not result['success']:
+            errors.append(result['error'])
+            suggestions.append({
+                'type': 'warning',
+                'line': start,
+                'message': f"Line {start}: This paragraph could not be checked right now"
+            })
+            continue
+
+        for issue in result['issues']:
+            line = start + issue['offset'] - 1
+            suggestions.append({'type': issue['type'], 'line': line, 'message': f"Line {line}: {issue['message']}"})
+        if result['summary']:
+            end = start + len(text.split('\n')) - 1
+            label = f"Line {start}" if end == start else f"Lines {start}-{end}"
+            summaries.append(f"{label}: {result['summary']}")
+
+    return {
+        # Paragraphs kept local cannot fail, so only the mentor's share decides
+        'success': not errors or len(errors) < len(pending),
+        'error': errors[0] if errors else None,
+        'analysis': '\n\n'.join(summaries),
+        'suggestions': suggestions,
+        'paragraphs': len(paragraphs),
+        'analyzed': len(pending),
+        'local_only': local_only
+    }
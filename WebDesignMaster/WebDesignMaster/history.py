@@ -0,0 +1,147 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select
+
+from cache import BoundedCache
+from models import Interaction
+
+# Turns kept per session; matches the window the chat route sends as context
+HISTORY_TURNS = int(os.environ.get('HISTORY_TURNS', 10))
+
+# Sessions kept per worker, least recently used dropped first
+HISTORY_MAX_SESSIONS = int(os.environ.get('HISTORY_MAX_SESSIONS', 2048))
+
+# Each worker has its own buffer, so a session that moves between workers can
+# miss turns written elsewhere; reloading from the database after this many
+# seconds bounds how stale a buffer can get
+HISTORY_TTL = float(os.environ.get('HISTORY_TTL', 600))
+
+# Turns per /api/history page, by default and at most
+HISTORY_PAGE_SIZE = int(os.environ.get('HISTORY_PAGE_SIZE', 20))
+HISTORY_MAX_PAGE_SIZE = 100
+
+Turn = Tuple[str, str]  # (user_input, mentor_response)
+
+
+class HistoryBuffer:
+    """Recent chat turns per session, held in a ring buffer.
+
+    The database is read only when a session is not buffered; new turns are
+    appended here as they are written, so the hot path never queries the
+    interactions table.
+    """
+
+    def __init__(self,
+                 turns: int = HISTORY_TURNS,
+                 max_sessions: int = HISTORY_MAX_SESSIONS,
+                 ttl: float = HISTORY_TTL):
+        self.turns = turns
+        self._sessions = BoundedCache(max_entries=max_sessions, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str, load: Callable[[int], Iterable[Turn]]) -> List[Turn]:
+        """Turns for session_id, oldest first; load(limit) fills a miss from the database"""
+        buffer = self._sessions.get(session_id)
+        if buffer is None:
+            buffer = deque(load(self.turns), maxlen=self.turns)
+            self._sessions.set(session_id, buffer)
+        with self._lock:
+            return list(buffer)
+
+    def append(self, session_id: str, user_input: str, mentor_response: str):
+        """Record a new turn; sessions not buffered are loaded fresh on their next read"""
+        buffer = self._sessions.get(session_id)
+        if buffer is not None:
+            with self._lock:
+                buffer.append((user_input, mentor_response))
+
+    def discard(self, session_id: str):
+        self._sessions.pop(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        return self._sessions.stats()
+
+
+history_buffer = HistoryBuffer()
+
+
+def as_messages(turns: Iterable[Turn]) -> List[Dict[str, str]]:
+    """Chat messages for a list of turns"""
+    messages = []
+    for user_input, mentor_response in turns:
+        messages.append({"role": "user", "content": user_input})
+        messages.append({"role": "assistant", "content": mentor_response})
+    return messages
+
+
+def encode_cursor(created_at: datetime, interaction_id: int) -> str:
+    """Opaque keyset cursor for the position after a turn"""
+    raw = json.dumps([created_at.isoformat(), interaction_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises ValueError for anything it did not make"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, interaction_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(interaction_id)
+    except (TypeError, ValueError, binascii.Error):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def history_page(connection, session_id: str, before: Optional[str] = None, limit: int = HISTORY_PAGE_SIZE,
+                 compact: bool = False, if_none_match: Callable[[str], bool] = lambda etag: False) -> Dict[str, Any]:
+    """One page of a session's turns, newest first, and the cursor for the next.
+
+    The page is located with the (session_id, created_at, id) index alone, and
+    compact pages are read entirely from it. Turns never change once written,
+    so the page's ids identify its content: when if_none_match(etag) is true
+    the bodies are not loaded and 'turns' is None.
+    """
+    table = Interaction.__table__
+    query = select(table.c.id, table.c.created_at, table.c.interaction_type, table.c.tokens_used).where(
+        table.c.session_id == session_id
+    ).order_by(table.c.created_at.desc(), table.c.id.desc()).limit(limit + 1)
+    if before:
+        created_at, interaction_id = decode_cursor(before)
+        query = query.where(or_(
+            table.c.created_at < created_at,
+            and_(table.c.created_at == created_at, table.c.id < interaction_id)
+        ))
+
+    rows = connection.execute(query).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    rows = rows[:limit]
+
+    etag = hashlib.sha256(
+        f"{compact}:{','.join(str(row.id) for row in rows)}:{next_cursor}".encode('utf-8')
+    ).hexdigest()[:16]
+    page = {'etag': etag, 'next_cursor': next_cursor, 'turns': None}
+    if if_none_match(etag):
+        return page
+
+    turns = [{
+        'id': row.id,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'interaction_type': row.interaction_type,
+        'tokens_used': row.tokens_used
+    } for row in rows]
+    if not compact and rows:
+        bodies = {row.id: row for row in connection.execute(
+            select(table.c.id, table.c.user_input, table.c.mentor_response).where(
+                table.c.id.in_([row.id for row in rows]))
+        )}
+        for turn in turns:
+            turn['user_input'] = bodies[turn['id']].user_input
+            turn['mentor_response'] = bodies[turn['id']].mentor_response
+    page['turns'] = turns
+    return page
@@ -1,4 +1,11 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    # The development server sets up its own schema; deployments run
+    # `flask --app main init-db` before starting workers
+    from commands import init_db
+    with app.app_context():
+        init_db()
+    app.run(host="0.0.0.0", port=5000, debug=True)
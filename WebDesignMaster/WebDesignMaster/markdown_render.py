@@ -0,0 +1,246 @@
+import hashlib
+import html
+import os
+import re
+from typing import List, Optional
+
+from cache import BoundedCache
+
+try:
+    import markdown
+except ImportError:
+    # Fall back to simple_markdown_to_html
+    markdown = None
+
+MARKDOWN_EXTENSIONS = ['codehilite', 'fenced_code', 'tables', 'toc']
+
+# Rendered preview pages keyed by a hash of filename and content
+render_cache = BoundedCache(
+    max_entries=int(os.environ.get('MARKDOWN_CACHE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('MARKDOWN_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    sizeof=len
+)
+
+# Block-level patterns for the fallback converter, matched once per line
+_HEADER = re.compile(r'^(#{1,3}) (.*)$')
+_UNORDERED_ITEM = re.compile(r'^\s*[-*+]\s')
+_ORDERED_ITEM = re.compile(r'^\s*\d+\.\s')
+_FENCE = re.compile(r'^\s*```')
+
+# Inline code, bold, italic and links in a single alternation so each line is
+# scanned once; code spans come first so their contents are left alone
+_INLINE = re.compile(
+    r'`(?P<code>[^`]*)`'
+    r'|\*\*(?P<strong>.+?)\*\*'
+    r'|\*(?P<em>.+?)\*'
+    r'|\[(?P<text>[^\]]+)\]\((?P<href>[^)]+)\)'
+)
+
+_MARKDOWN_SHELL = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <style>
+        body {
+            font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, Oxygen, Ubuntu, Cantarell, sans-serif;
+            line-height: 1.6;
+            max-width: 800px;
+            margin: 0 auto;
+            padding: 20px;
+            background: #fff;
+            color: #333;
+        }
+        h1, h2, h3, h4, h5, h6 {
+            color: #2c3e50;
+            margin-top: 1.5em;
+            margin-bottom: 0.5em;
+        }
+        h1 { border-bottom: 2px solid #eee; padding-bottom: 10px; }
+        h2 { border-bottom: 1px solid #eee; padding-bottom: 5px; }
+        code {
+            background: #f8f9fa;
+            padding: 2px 4px;
+            border-radius: 3px;
+            font-family: 'Monaco', 'Consolas', monospace;
+            color: #e83e8c;
+        }
+        pre {
+            background: #f8f9fa;
+            border: 1px solid #e9ecef;
+            border-radius: 5px;
+            padding: 15px;
+            overflow-x: auto;
+        }
+        pre code {
+            background: none;
+            padding: 0;
+            color: inherit;
+        }
+        blockquote {
+            border-left: 4px solid #007bff;
+            margin: 0;
+            padding-left: 20px;
+            color: #6c757d;
+        }
+        table {
+            border-collapse: collapse;
+            width: 100%;
+            margin: 1em 0;
+        }
+        th, td {
+            border: 1px solid #dee2e6;
+            padding: 8px 12px;
+            text-align: left;
+        }
+        th {
+            background: #f8f9fa;
+            font-weight: 600;
+        }
+        img {
+            max-width: 100%;
+            height: auto;
+        }
+        a {
+            color: #007bff;
+            text-decoration: none;
+        }
+        a:hover {
+            text-decoration: underline;
+        }
+        ul, ol {
+            padding-left: 20px;
+        }
+        li {
+            margin: 0.25em 0;
+        }
+    </style>
+</head>
+<body>
+{body}
+</body>
+</html>"""
+
+# The shell is split once so a page is just its pieces joined around the body
+_MARKDOWN_HEAD, _rest = _MARKDOWN_SHELL.split('{title}')
+_MARKDOWN_MIDDLE, _MARKDOWN_TAIL = _rest.split('{body}')
+
+_HTML_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>"""
+_HTML_MIDDLE = """</title>
+</head>
+<body>
+"""
+_HTML_TAIL = """
+</body>
+</html>"""
+
+
+def _inline(match):
+    if match.group('code') is not None:
+        return f'<code>{match.group("code")}</code>'
+    if match.group('strong') is not None:
+        return f'<strong>{match.group("strong")}</strong>'
+    if match.group('em') is not None:
+        return f'<em>{match.group("em")}</em>'
+    return f'<a href="{match.group("href")}">{match.group("text")}</a>'
+
+
+def simple_markdown_to_html(markdown_text: str) -> str:
+    """Simple markdown to HTML converter for basic formatting, in one pass over the lines"""
+    result_lines: List[str] = []
+    list_tag = None     # 'ul' or 'ol' while inside a list
+    code_lines = None   # lines of an open fenced code block
+    blank = False
+
+    for line in markdown_text.split('\n'):
+        if code_lines is not None:
+            if _FENCE.match(line):
+                result_lines.append('<pre><code>' + html.escape('\n'.join(code_lines)) + '</code></pre>')
+                code_lines = None
+            else:
+                code_lines.append(line)
+            continue
+
+        item = _UNORDERED_ITEM.match(line)
+        tag = 'ul' if item else None
+        if not item:
+            item = _ORDERED_ITEM.match(line)
+            tag = 'ol' if item else None
+
+        if list_tag and tag != list_tag:
+            result_lines.append(f'</{list_tag}>')
+            list_tag = None
+
+        if item:
+            if not list_tag:
+                result_lines.append(f'<{tag}>')
+                list_tag = tag
+            result_lines.append('<li>' + _INLINE.sub(_inline, line[item.end():]) + '</li>')
+            blank = False
+        elif _FENCE.match(line):
+            code_lines = []
+            blank = False
+        elif not line.strip():
+            # Runs of blank lines collapse into one break
+            if not blank:
+                result_lines.append('<br>')
+            blank = True
+        else:
+            header = _HEADER.match(line)
+            if header:
+                level = len(header.group(1))
+                result_lines.append(f'<h{level}>' + _INLINE.sub(_inline, header.group(2)) + f'</h{level}>')
+            else:
+                result_lines.append('<p>' + _INLINE.sub(_inline, line) + '</p>')
+            blank = False
+
+    if code_lines is not None:
+        result_lines.append('<pre><code>' + html.escape('\n'.join(code_lines)) + '</code></pre>')
+    if list_tag:
+        result_lines.append(f'</{list_tag}>')
+
+    return '\n'.join(result_lines)
+
+
+def markdown_to_html(markdown_text: str) -> str:
+    """Markdown body HTML, using the markdown package when it is installed"""
+    if markdown is not None:
+        return markdown.markdown(markdown_text, extensions=MARKDOWN_EXTENSIONS)
+    return simple_markdown_to_html(markdown_text)
+
+
+def _cache_key(kind: str, filename: str, content: str) -> str:
+    digest = hashlib.sha256()
+    for part in (kind, filename, content):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def render_markdown_page(content: str, filename: str, content_hash: Optional[str] = None) -> str:
+    """Full styled HTML page for a Markdown preview, cached by content hash.
+
+    Callers that already hold a content address for (filename, content), like
+    a preview id, can pass it to skip rehashing.
+    """
+    key = content_hash or _cache_key('markdown', filename, content)
+    page = render_cache.get(key)
+    if page is None:
+        page = ''.join((_MARKDOWN_HEAD, html.escape(filename), _MARKDOWN_MIDDLE,
+                        markdown_to_html(content), _MARKDOWN_TAIL))
+        render_cache.set(key, page)
+    return page
+
+
+def render_html_page(content: str, filename: str) -> str:
+    """HTML preview page, wrapping fragments in a basic document"""
+    stripped = content.lstrip()[:9].lower()
+    if stripped.startswith('<!doctype') or stripped.startswith('<html'):
+        return content
+    return ''.join((_HTML_HEAD, html.escape(filename), _HTML_MIDDLE, content, _HTML_TAIL))
@@ -0,0 +1,378 @@
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from export import token_allowed
+
+logger = logging.getLogger(__name__)
+
+# gunicorn workers each write their metrics to a file here, and /metrics
+# merges them; the directory should be emptied before the server starts
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+
+# Seconds between a worker's writes to its metrics file
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+# When set, /metrics requires "Authorization: Bearer <token>"
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+UPSTREAM_BUCKETS = (0.25, 0.5, 1, 2, 4, 8, 15, 30, 60)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    'http_request_duration_seconds': ('histogram', 'Request latency by route', REQUEST_BUCKETS),
+    'llm_request_duration_seconds': ('histogram', 'Model API latency by model and key index', UPSTREAM_BUCKETS),
+    'llm_tokens_total': ('counter', 'Tokens used by the model API', None),
+    'run_code_execution_seconds': ('histogram', 'Time spent running user code', REQUEST_BUCKETS),
+    'db_query_duration_seconds': ('histogram', 'Database statement latency', QUERY_BUCKETS),
+    'cache_hits_total': ('counter', 'In-memory cache hits', None),
+    'cache_misses_total': ('counter', 'In-memory cache misses', None),
+    'cache_evictions_total': ('counter', 'In-memory cache evictions', None),
+    'cache_entries': ('gauge', 'Entries held by in-memory caches', None),
+    'cache_bytes': ('gauge', 'Bytes held by in-memory caches', None),
+    'compression_responses_total': ('counter', 'Responses seen by the compression middleware', None),
+    'compression_bytes_in_total': ('counter', 'Response bytes before compression', None),
+    'compression_bytes_out_total': ('counter', 'Response bytes after compression', None),
+    'compression_seconds_total': ('counter', 'Time spent compressing responses', None),
+    'static_asset_bytes': ('gauge', 'Bytes of fingerprinted static assets by encoding', None),
+    'write_behind_pending': ('gauge', 'Records waiting in write-behind queues', None),
+    'write_behind_written_total': ('counter', 'Records written by write-behind queues', None),
+    'write_behind_batches_total': ('counter', 'Batches written by write-behind queues', None),
+    'write_behind_failures_total': ('counter', 'Failed write-behind batches', None),
+    'write_behind_dropped_total': ('counter', 'Records dropped by full write-behind queues', None),
+    'write_behind_rejected_total': ('counter', 'Records write-behind queues could never write', None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+Key = Tuple[str, Labels]
+Sample = Tuple[str, Dict[str, Any], float]
+
+
+def _key(name: str, labels: Dict[str, Any]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+class _Shard:
+    """Counters and histograms written by a single thread"""
+
+    __slots__ = ('counters', 'histograms')
+
+    def __init__(self):
+        self.counters: Dict[Key, float] = {}
+        # Per-bucket counts (the last one is +Inf) followed by the sum
+        self.histograms: Dict[Key, List[float]] = {}
+
+    def merge_into(self, counters: Dict[Key, float], histograms: Dict[Key, List[float]]):
+        # dict.copy() is atomic under the GIL, so the owner may keep writing
+        for key, value in self.counters.copy().items():
+            counters[key] = counters.get(key, 0) + value
+        for key, values in self.histograms.copy().items():
+            merged = histograms.setdefault(key, [0] * len(values))
+            for index, value in enumerate(list(values)):
+                merged[index] += value
+
+
+class MetricsRegistry:
+    """Process-wide metrics with lock-free recording.
+
+    Each thread records into its own shard, so inc() and observe() never
+    take a lock; a scrape merges the shards. A snapshot may catch a
+    histogram between its bucket and its sum being updated, which is off by
+    one observation at most. Collectors are called on each scrape for values
+    other modules already count, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._collectors: Dict[str, Callable[[], Iterable[Sample]]] = {}
+        self._last_flush = 0.0
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            # Workers forked from a preloaded app start from zero
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: List[Tuple[threading.Thread, _Shard]] = []
+        self._retired = _Shard()
+
+    def _shard(self) -> _Shard:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                # Fold in the shards of finished threads so per-request
+                # threads do not grow the list without bound
+                live = []
+                for thread, other in self._shards:
+                    if thread.is_alive():
+                        live.append((thread, other))
+                    else:
+                        other.merge_into(self._retired.counters, self._retired.histograms)
+                live.append((threading.current_thread(), shard))
+                self._shards = live
+        return shard
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        counters = self._shard().counters
+        key = _key(name, labels)
+        counters[key] = counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        histograms = self._shard().histograms
+        key = _key(name, labels)
+        values = histograms.get(key)
+        if values is None:
+            values = histograms[key] = [0] * (len(buckets) + 2)
+        values[bisect_left(buckets, value)] += 1
+        values[-1] += value
+
+    def set_collector(self, name: str, collect: Callable[[], Iterable[Sample]]):
+        """Register (or replace) a function returning (metric, labels, value) samples"""
+        self._collectors[name] = collect
+
+    def snapshot(self) -> Dict[str, Any]:
+        """This process's metrics in a JSON-friendly form"""
+        counters: Dict[Key, float] = {}
+        histograms: Dict[Key, List[float]] = {}
+        # Held so a finished thread's shard is not folded in mid-merge;
+        # only threads creating their shard ever wait on it
+        with self._lock:
+            for shard in [self._retired] + [shard for _, shard in self._shards]:
+                shard.merge_into(counters, histograms)
+
+        samples = []
+        for name, collect in list(self._collectors.items()):
+            try:
+                samples.extend([metric, dict(labels), value] for metric, labels, value in collect())
+            except Exception as e:
+                logger.error(f"Metrics collector {name} failed: {e}")
+
+        return {
+            'pid': os.getpid(),
+            'counters': [[name, dict(labels), value] for (name, labels), value in counters.items()],
+            'histograms': [[name, dict(labels), values] for (name, labels), values in histograms.items()],
+            'samples': samples
+        }
+
+    def write_process_file(self, directory: Optional[str] = METRICS_MULTIPROC_DIR):
+        """Save this worker's snapshot for the multiprocess collector"""
+        if not directory:
+            return
+        path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w') as handle:
+            json.dump(self.snapshot(), handle)
+        os.replace(temporary, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_write_process_file(self):
+        if METRICS_MULTIPROC_DIR and time.monotonic() - self._last_flush >= METRICS_FLUSH_INTERVAL:
+            try:
+                self.write_process_file()
+            except OSError as e:
+                logger.error(f"Could not write metrics file: {e}")
+
+    def collect(self, directory: Optional[str] = METRICS_MULTIPROC_DIR) -> List[Dict[str, Any]]:
+        """Snapshots of every worker, or only this process without a directory"""
+        if not directory:
+            return [self.snapshot()]
+
+        self.write_process_file(directory)
+        snapshots = []
+        for name in sorted(os.listdir(directory)):
+            if not (name.startswith('metrics-') and name.endswith('.json')):
+                continue
+            try:
+                with open(os.path.join(directory, name)) as handle:
+                    snapshots.append(json.load(handle))
+            except (OSError, ValueError):
+                # A worker replacing its file, or one cut off mid-write
+                continue
+        return snapshots
+
+    def render(self, directory: Optional[str] = METRICS_MULTIPROC_DIR) -> str:
+        return render_prometheus(self.collect(directory))
+
+
+def _process_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Tuple[Dict[Key, float], Dict[Key, List[float]]]:
+    """Sum snapshots into (values, histograms).
+
+    Counters and histograms recorded by workers that have since exited stay
+    in the totals; collector samples describe live state such as cache
+    sizes, so only running workers' samples are counted.
+    """
+    values: Dict[Key, float] = {}
+    histograms: Dict[Key, List[float]] = {}
+    for snapshot in snapshots:
+        alive = _process_alive(snapshot['pid'])
+        rows = snapshot['counters'] + (snapshot['samples'] if alive else [])
+        for name, labels, value in rows:
+            key = _key(name, labels)
+            values[key] = values.get(key, 0) + value
+        for name, labels, counts in snapshot['histograms']:
+            merged = histograms.setdefault(_key(name, labels), [0] * len(counts))
+            for index, count in enumerate(counts):
+                merged[index] += count
+    return values, histograms
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_prometheus(snapshots: Iterable[Dict[str, Any]]) -> str:
+    """Prometheus text exposition format for a list of snapshots"""
+    values, histograms = merge_snapshots(snapshots)
+    by_name: Dict[str, List[str]] = {}
+
+    for (name, labels), value in sorted(values.items()):
+        by_name.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+    for (name, labels), counts in sorted(histograms.items()):
+        lines = by_name.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(list(METRICS[name][2]) + ['+Inf'], counts[:-1]):
+            cumulative += count
+            le = bound if bound == '+Inf' else _format_value(bound)
+            lines.append(f'{name}_bucket{_format_labels(labels, (("le", le),))} {_format_value(cumulative)}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(counts[-1])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {_format_value(cumulative)}')
+
+    output = []
+    for name in sorted(by_name):
+        kind, description, _ = METRICS.get(name, ('untyped', name, None))
+        output.append(f'# HELP {name} {description}')
+        output.append(f'# TYPE {name} {kind}')
+        output.extend(by_name[name])
+    return '\n'.join(output) + '\n'
+
+
+def cache_samples(cache: str, stats: Dict[str, Any]) -> List[Sample]:
+    """Samples for a BoundedCache.stats() dictionary"""
+    labels = {'cache': cache}
+    return [
+        ('cache_hits_total', labels, stats['hits']),
+        ('cache_misses_total', labels, stats['misses']),
+        ('cache_evictions_total', labels, stats['evictions']),
+        ('cache_entries', labels, stats['entries']),
+        ('cache_bytes', labels, stats['bytes'])
+    ]
+
+
+def compression_samples(stats: Dict[str, Any]) -> List[Sample]:
+    return [
+        ('compression_responses_total', {'result': 'compressed'}, stats['compressed']),
+        ('compression_responses_total', {'result': 'skipped'}, stats['skipped']),
+        ('compression_bytes_in_total', {}, stats['bytes_in']),
+        ('compression_bytes_out_total', {}, stats['bytes_out']),
+        ('compression_seconds_total', {}, stats['seconds'])
+    ]
+
+
+def write_behind_samples(queue: str, stats: Dict[str, int]) -> List[Sample]:
+    labels = {'queue': queue}
+    return [
+        ('write_behind_pending', labels, stats['pending']),
+        ('write_behind_written_total', labels, stats['written']),
+        ('write_behind_batches_total', labels, stats['batches']),
+        ('write_behind_failures_total', labels, stats['failures']),
+        ('write_behind_dropped_total', labels, stats['dropped']),
+        ('write_behind_rejected_total', labels, stats['rejected'])
+    ]
+
+
+metrics = MetricsRegistry()
+
+
+def instrument_engine(engine):
+    """Time every statement run on engine, by its leading keyword"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def end_query(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['metrics_query_started'].pop()
+        operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+        metrics.observe('db_query_duration_seconds', time.perf_counter() - started, operation=operation)
+
+    @event.listens_for(engine, 'handle_error')
+    def failed_query(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('metrics_query_started'):
+            connection.info['metrics_query_started'].pop()
+
+
+def init_app(app, engine=None):
+    """Time every request by route and serve the registry on /metrics"""
+    from flask import Response, g, jsonify, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    def record(status: int):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        metrics.observe('http_request_duration_seconds', time.perf_counter() - started,
+                        route=route, method=request.method, status=status)
+        metrics.maybe_write_process_file()
+
+    @app.after_request
+    def record_request(response):
+        record(response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exception):
+        # after_request does not run when a request ends in an unhandled error
+        record(500)
+
+    def metrics_view():
+        if METRICS_TOKEN and not token_allowed(request.headers.get('Authorization'), METRICS_TOKEN):
+            return jsonify({'error': 'Invalid metrics token'}), 401
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    if engine is not None:
+        instrument_engine(engine)
+
+    if METRICS_MULTIPROC_DIR:
+        atexit.register(metrics.write_process_file)
@@ -0,0 +1,75 @@
+from typing import Callable, List, Tuple, Union
+
+from sqlalchemy import inspect, text
+
+
+def add_column(table: str, column: str, definition: str) -> Callable:
+    """Step adding a column unless create_all() already made it"""
+    def step(connection):
+        if column not in {c['name'] for c in inspect(connection).get_columns(table)}:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return step
+
+
+def create_search_index(connection):
+    from retrieval import create_search_index
+    create_search_index(connection)
+
+
+def reconcile_session_stats(connection):
+    from session_stats import reconcile
+    reconcile(connection)
+
+
+# Schema changes for databases created before the models gained them, applied
+# in order and recorded in schema_migrations. create_all() only creates
+# missing tables, so every change to an existing table belongs here too.
+# Steps are SQL that runs on both SQLite and PostgreSQL, or callables taking
+# the connection.
+MIGRATIONS: List[Tuple[str, List[Union[str, Callable]]]] = [
+    ('0001_session_counters', [
+        add_column('interaction', 'tokens_used', 'INTEGER'),
+        add_column('session', 'interaction_count', "INTEGER NOT NULL DEFAULT 0"),
+        add_column('session', 'learn_count', "INTEGER NOT NULL DEFAULT 0"),
+        add_column('session', 'code_count', "INTEGER NOT NULL DEFAULT 0"),
+        add_column('session', 'tokens_used', "INTEGER NOT NULL DEFAULT 0"),
+        add_column('session', 'last_activity_at', 'TIMESTAMP'),
+        reconcile_session_stats,
+    ]),
+    # Serves both recent-turn lookups and history pages; needs tokens_used from 0001
+    ('0002_interaction_history_index', [
+        "CREATE INDEX IF NOT EXISTS ix_interaction_session_history "
+        "ON interaction (session_id, created_at, id, interaction_type, tokens_used)",
+    ]),
+    ('0003_interaction_search_index', [
+        create_search_index,
+    ]),
+]
+
+
+def applied_migrations(connection) -> set:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR(128) PRIMARY KEY, applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    return {row[0] for row in connection.execute(text("SELECT name FROM schema_migrations"))}
+
+
+def run_migrations(engine) -> List[str]:
+    """Apply pending migrations, each in its own transaction; returns their names"""
+    with engine.begin() as connection:
+        applied = applied_migrations(connection)
+
+    ran = []
+    for name, statements in MIGRATIONS:
+        if name in applied:
+            continue
+        with engine.begin() as connection:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.execute(text(statement))
+            connection.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {'name': name})
+        ran.append(name)
+    return ran
@@ -1,4 +1,4 @@
-from app import db
+from database import db
 from datetime import datetime
 
 class Session(db.Model):
@@ -9,10 +9,25 @@ class Session(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Running totals kept as interactions are written; see session_stats.py
+    interaction_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    learn_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    code_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    tokens_used = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    last_activity_at = db.Column(db.DateTime)
+
 class Interaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     session_id = db.Column(db.String(256), nullable=False)
     user_input = db.Column(db.Text, nullable=False)
     mentor_response = db.Column(db.Text, nullable=False)
     interaction_type = db.Column(db.String(50))  # 'learn' or 'code'
+    tokens_used = db.Column(db.Integer)  # as reported by the model API
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # History is read per session, newest first, by (created_at, id); the
+    # trailing columns let compact history pages come from the index alone
+    __table_args__ = (
+        db.Index('ix_interaction_session_history', 'session_id', 'created_at', 'id', 'interaction_type',
+                 'tokens_used'),
+    )
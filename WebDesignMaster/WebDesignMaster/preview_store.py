@@ -0,0 +1,99 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from cache import BoundedCache
+
+# Previews are kept in memory by each worker, so a preview opened on another
+# worker is a miss; the client simply runs the file again
+PREVIEW_TTL = float(os.environ.get('PREVIEW_TTL', 3600))
+PREVIEW_MAX_ENTRIES = int(os.environ.get('PREVIEW_MAX_ENTRIES', 1024))
+PREVIEW_MAX_BYTES = int(os.environ.get('PREVIEW_MAX_BYTES', 64 * 1024 * 1024))
+
+# Per-session quotas; a session over either limit loses its oldest previews
+PREVIEW_SESSION_QUOTA = int(os.environ.get('PREVIEW_SESSION_QUOTA', 20))
+PREVIEW_SESSION_MAX_BYTES = int(os.environ.get('PREVIEW_SESSION_MAX_BYTES', 4 * 1024 * 1024))
+
+
+def preview_id_for(session_id: str, kind: str, filename: str, content: str) -> str:
+    """Content address of a preview, scoped to the session that created it"""
+    digest = hashlib.sha256()
+    for part in (session_id, kind, filename, content):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:32]
+
+
+class PreviewStore:
+    """Server-side store for HTML and Markdown previews.
+
+    Previews are content-addressed, so running an unchanged file again reuses
+    its entry. The id doubles as the preview's ETag.
+    """
+
+    def __init__(self,
+                 max_entries: int = PREVIEW_MAX_ENTRIES,
+                 max_bytes: int = PREVIEW_MAX_BYTES,
+                 ttl: float = PREVIEW_TTL,
+                 session_quota: int = PREVIEW_SESSION_QUOTA,
+                 session_max_bytes: int = PREVIEW_SESSION_MAX_BYTES):
+        self.session_quota = session_quota
+        self.session_max_bytes = session_max_bytes
+        self.max_entries = max_entries
+
+        self._previews = BoundedCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl,
+                                      sizeof=lambda preview: len(preview['content']))
+        # session id -> OrderedDict of that session's preview ids and sizes,
+        # oldest first. Not an LRU: evicting a session that still has previews
+        # would reset its quota. Sessions whose previews are all gone are swept.
+        self._sessions: Dict[str, OrderedDict] = {}
+        self._lock = threading.Lock()
+
+    def put(self, session_id: str, kind: str, filename: str, content: str) -> Optional[str]:
+        """Store a preview and return its id, or None if it is too large to keep"""
+        size = len(content)
+        if size > self.session_max_bytes:
+            return None
+
+        preview_id = preview_id_for(session_id, kind, filename, content)
+        preview = {'content': content, 'filename': filename, 'type': kind, 'session_id': session_id}
+        if not self._previews.set(preview_id, preview):
+            return None
+
+        with self._lock:
+            owned = self._sessions.setdefault(session_id, OrderedDict())
+            owned.pop(preview_id, None)
+            owned[preview_id] = size
+
+            # Forget previews the global bounds already evicted, then enforce the quota
+            for stale in [key for key in owned if key not in self._previews]:
+                del owned[stale]
+            while len(owned) > self.session_quota or sum(owned.values()) > self.session_max_bytes:
+                oldest, _ = owned.popitem(last=False)
+                self._previews.pop(oldest)
+
+            # Each remaining session holds a live preview, so a sweep leaves at
+            # most max_entries and the next one is max_entries puts away
+            if len(self._sessions) > 2 * self.max_entries:
+                self._sweep()
+
+        return preview_id
+
+    def _sweep(self):
+        for session_id, owned in list(self._sessions.items()):
+            for stale in [key for key in owned if key not in self._previews]:
+                del owned[stale]
+            if not owned:
+                del self._sessions[session_id]
+
+    def get(self, preview_id: str) -> Optional[Dict[str, Any]]:
+        """The stored preview, or None if it expired or never existed"""
+        return self._previews.get(preview_id)
+
+    def stats(self) -> dict:
+        return dict(self._previews.stats(), sessions=len(self._sessions))
+
+
+preview_store = PreviewStore()
@@ -0,0 +1,161 @@
+import logging
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Relevant earlier turns added to the chat prompt, beyond the recent window
+RETRIEVAL_TOP_K = int(os.environ.get('RETRIEVAL_TOP_K', 2))
+
+# The most recent turns are sent anyway, so they are never retrieved
+RETRIEVAL_RECENT_TURNS = 2
+
+# Each retrieved message is cut to this many characters
+RETRIEVAL_MAX_CHARS = int(os.environ.get('RETRIEVAL_MAX_CHARS', 1200))
+
+MIN_TERM_LENGTH = 3
+MAX_QUERY_TERMS = 16
+STOP_WORDS = {
+    'about', 'and', 'are', 'but', 'can', 'could', 'did', 'does', 'for', 'from', 'have', 'how', 'its',
+    'just', 'not', 'remember', 'should', 'that', 'the', 'then', 'there', 'this', 'was', 'what', 'when',
+    'where', 'which', 'why', 'will', 'with', 'would', 'you', 'your', 'earlier', 'before'
+}
+
+_TERM = re.compile(r'[A-Za-z0-9_]+')
+
+SQLITE_SCHEMA = [
+    # External-content table: the text stays in interaction, only the index is stored
+    "CREATE VIRTUAL TABLE IF NOT EXISTS interaction_fts USING fts5("
+    "user_input, mentor_response, content='interaction', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS interaction_fts_insert AFTER INSERT ON interaction BEGIN "
+    "INSERT INTO interaction_fts(rowid, user_input, mentor_response) "
+    "VALUES (new.id, new.user_input, new.mentor_response); END",
+    "CREATE TRIGGER IF NOT EXISTS interaction_fts_delete AFTER DELETE ON interaction BEGIN "
+    "INSERT INTO interaction_fts(interaction_fts, rowid, user_input, mentor_response) "
+    "VALUES ('delete', old.id, old.user_input, old.mentor_response); END",
+    "CREATE TRIGGER IF NOT EXISTS interaction_fts_update AFTER UPDATE OF user_input, mentor_response "
+    "ON interaction BEGIN "
+    "INSERT INTO interaction_fts(interaction_fts, rowid, user_input, mentor_response) "
+    "VALUES ('delete', old.id, old.user_input, old.mentor_response); "
+    "INSERT INTO interaction_fts(rowid, user_input, mentor_response) "
+    "VALUES (new.id, new.user_input, new.mentor_response); END",
+    "INSERT INTO interaction_fts(interaction_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_SCHEMA = [
+    "ALTER TABLE interaction ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS "
+    "(to_tsvector('english', coalesce(user_input, '') || ' ' || coalesce(mentor_response, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_interaction_search_vector ON interaction USING GIN (search_vector)",
+]
+
+SQLITE_QUERY = text(
+    "SELECT i.id, i.user_input, i.mentor_response FROM interaction_fts "
+    "JOIN interaction i ON i.id = interaction_fts.rowid "
+    "WHERE interaction_fts MATCH :query AND i.session_id = :session_id "
+    "AND i.id NOT IN (SELECT id FROM interaction WHERE session_id = :session_id "
+    "ORDER BY created_at DESC, id DESC LIMIT :recent) "
+    "ORDER BY bm25(interaction_fts) LIMIT :limit"
+)
+
+POSTGRES_QUERY = text(
+    "SELECT id, user_input, mentor_response FROM interaction "
+    "WHERE search_vector @@ to_tsquery('english', :query) AND session_id = :session_id "
+    "AND id NOT IN (SELECT id FROM interaction WHERE session_id = :session_id "
+    "ORDER BY created_at DESC, id DESC LIMIT :recent) "
+    "ORDER BY ts_rank(search_vector, to_tsquery('english', :query)) DESC LIMIT :limit"
+)
+
+
+def create_search_index(connection):
+    """Migration step: the full-text index over interactions for this database"""
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        statements = POSTGRES_SCHEMA
+    elif dialect == 'sqlite' and connection.execute(text("SELECT sqlite_compileoption_used('ENABLE_FTS5')")).scalar():
+        statements = SQLITE_SCHEMA
+    else:
+        logger.warning(f"No full-text index for this {dialect} database; chat uses recent turns only")
+        return
+
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def has_search_index(bind) -> bool:
+    inspector = inspect(bind)
+    if bind.dialect.name == 'sqlite':
+        return 'interaction_fts' in inspector.get_table_names()
+    if bind.dialect.name == 'postgresql':
+        return 'search_vector' in {column['name'] for column in inspector.get_columns('interaction')}
+    return False
+
+
+def query_terms(message: str) -> List[str]:
+    terms = []
+    for term in _TERM.findall(message.lower()):
+        if len(term) >= MIN_TERM_LENGTH and term not in STOP_WORDS and term not in terms:
+            terms.append(term)
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _truncate(value: str) -> str:
+    return value if len(value) <= RETRIEVAL_MAX_CHARS else value[:RETRIEVAL_MAX_CHARS] + '…'
+
+
+class TurnRetriever:
+    """Finds a session's earlier turns that are relevant to a new message"""
+
+    def __init__(self, top_k: int = RETRIEVAL_TOP_K, recent_turns: int = RETRIEVAL_RECENT_TURNS):
+        self.top_k = top_k
+        self.recent_turns = recent_turns
+        self._available: Optional[bool] = None
+
+    def search(self, session, session_id: str, message: str,
+               recent: Iterable[Tuple[str, str]] = ()) -> List[Dict[str, Any]]:
+        """Up to top_k earlier turns, most relevant first.
+
+        Neither the last recent_turns rows in the database nor any turn in
+        recent (the turns already in the prompt, some possibly not written
+        yet) are returned.
+        """
+        if self.top_k <= 0:
+            return []
+        bind = session.get_bind()
+        if self._available is None:
+            self._available = has_search_index(bind)
+        terms = query_terms(message)
+        if not self._available or not terms:
+            return []
+
+        if bind.dialect.name == 'postgresql':
+            statement, query = POSTGRES_QUERY, ' | '.join(terms)
+        else:
+            # Quoted terms are literal, so user text cannot inject FTS5 syntax
+            statement, query = SQLITE_QUERY, ' OR '.join(f'"{term}"' for term in terms)
+
+        recent = set(recent)
+        rows = session.execute(statement, {
+            'query': query, 'session_id': session_id, 'recent': self.recent_turns,
+            'limit': self.top_k + len(recent)
+        }).all()
+        return [{
+            'id': row.id,
+            'user_input': _truncate(row.user_input),
+            'mentor_response': _truncate(row.mentor_response)
+        } for row in rows if (row.user_input, row.mentor_response) not in recent][:self.top_k]
+
+
+def as_context_message(turns: List[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """A system message quoting retrieved turns, or None when there are none"""
+    if not turns:
+        return None
+    parts = ["Relevant earlier exchanges from this conversation:"]
+    for turn in turns:
+        parts.append(f"User: {turn['user_input']}\nMentor: {turn['mentor_response']}")
+    return {"role": "system", "content": '\n\n'.join(parts)}
+
+
+turn_retriever = TurnRetriever()
@@ -0,0 +1,214 @@
+import ast
+import hashlib
+import json
+import os
+import re
+import subprocess
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from cache import BoundedCache
+
+# Interpreter used to execute user code
+PYTHON_COMMAND = 'python'
+
+# Line-event budget for a single run; stops runaway loops long before the wall-clock timeout
+DEFAULT_LINE_BUDGET = int(os.environ.get('RUN_LINE_BUDGET', 5_000_000))
+MAX_LINE_BUDGET = int(os.environ.get('RUN_MAX_LINE_BUDGET', 50_000_000))
+MIN_LINE_BUDGET = 1_000
+
+# Exit status and stderr marker the runner uses to report an exhausted budget
+BUDGET_EXIT_CODE = 86
+BUDGET_MARKER = '__LINE_BUDGET_EXCEEDED__'
+
+# Executes the user's file under a line counter. Uses sys.monitoring where the
+# interpreter has it (3.12+) so library code can be switched off per code
+# object, and falls back to a per-frame sys.settrace hook otherwise.
+RUNNER_SOURCE = r'''
+import json, os, sys, traceback
+
+path, budget = sys.argv[1], int(sys.argv[2])
+sys.argv = [path]
+counts = {}
+used = 0
+
+def exhausted(line):
+    sys.stdout.flush()
+    hot_line, hot_count = max(counts.items(), key=lambda item: item[1])
+    sys.stderr.write(MARKER + json.dumps({
+        'budget': budget, 'line': line, 'hot_line': hot_line, 'hot_count': hot_count
+    }) + '\n')
+    sys.stderr.flush()
+    os._exit(EXIT_CODE)
+
+def count(line):
+    global used
+    used += 1
+    counts[line] = counts.get(line, 0) + 1
+    if used > budget:
+        exhausted(line)
+
+if hasattr(sys, 'monitoring'):
+    monitoring = sys.monitoring
+    tool = monitoring.DEBUGGER_ID
+    monitoring.use_tool_id(tool, 'line-budget')
+
+    def on_line(code, line):
+        if code.co_filename != path:
+            return monitoring.DISABLE
+        count(line)
+
+    monitoring.register_callback(tool, monitoring.events.LINE, on_line)
+    monitoring.set_events(tool, monitoring.events.LINE)
+else:
+    def local_trace(frame, event, arg):
+        global used
+        if event == 'line':
+            line = frame.f_lineno
+            counts[line] = counts.get(line, 0) + 1
+            used += 1
+            if used > budget:
+                exhausted(line)
+        return local_trace
+
+    def global_trace(frame, event, arg):
+        if frame.f_code.co_filename == path:
+            return local_trace
+        return None
+
+    sys.settrace(global_trace)
+
+with open(path) as source_file:
+    program = compile(source_file.read(), path, 'exec')
+
+try:
+    exec(program, {'__name__': '__main__', '__file__': path})
+except SystemExit:
+    raise
+except BaseException as error:
+    # Hide the runner's own frame from the student's traceback
+    traceback.print_exception(type(error), error, error.__traceback__.tb_next)
+    sys.exit(1)
+'''.replace('MARKER', repr(BUDGET_MARKER)).replace('EXIT_CODE', str(BUDGET_EXIT_CODE))
+
+# Modules that cannot make a program's output depend on the outside world
+PURE_MODULES = {
+    'abc', 'array', 'bisect', 'collections', 'copy', 'dataclasses', 'decimal',
+    'enum', 'fractions', 'functools', 'heapq', 'itertools', 'math', 'operator',
+    're', 'statistics', 'string', 'textwrap', 'typing'
+}
+
+# Builtins that reach files, the interpreter internals or dynamic code
+IMPURE_BUILTINS = {
+    'open', 'eval', 'exec', 'compile', '__import__', 'breakpoint', 'globals',
+    'locals', 'vars', 'memoryview', 'help',
+    # Object addresses, which differ on every run
+    'id', 'hash',
+    # Reads stdin; answers collected by the page are substituted before this check
+    'input'
+}
+
+# Hash seed for user programs, so set and dict iteration over strings
+# prints in the same order on every run
+PYTHON_HASH_SEED = '0'
+
+# Default reprs such as <Node object at 0x7f3a...> print an address
+ADDRESS_REPR = re.compile(r' at 0x[0-9a-fA-F]+')
+
+# Cached results of deterministic programs, bounded by output size and age
+execution_cache = BoundedCache(
+    max_entries=int(os.environ.get('RUN_CACHE_MAX_ENTRIES', 512)),
+    max_bytes=int(os.environ.get('RUN_CACHE_MAX_BYTES', 8 * 1024 * 1024)),
+    ttl=float(os.environ.get('RUN_CACHE_TTL', 3600)),
+    sizeof=lambda result: len(result.get('output', '')) + len(result.get('error', ''))
+)
+
+
+def is_deterministic(code: str) -> bool:
+    """Cheap static check that a program does not touch time, randomness, files or the network"""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        # Syntax errors are reported the same way on every run
+        return True
+    except (RecursionError, MemoryError):
+        # Too deeply nested to check; the program still runs, uncached
+        return False
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            if any(alias.name.split('.')[0] not in PURE_MODULES for alias in node.names):
+                return False
+        elif isinstance(node, ast.ImportFrom):
+            if node.level or (node.module or '').split('.')[0] not in PURE_MODULES:
+                return False
+        elif isinstance(node, ast.Name):
+            if node.id in IMPURE_BUILTINS or node.id == '__builtins__':
+                return False
+        elif isinstance(node, ast.Attribute):
+            # Dunder access is the usual way around import restrictions
+            if node.attr.startswith('__') and node.attr.endswith('__'):
+                return False
+    return True
+
+
+@lru_cache(maxsize=1)
+def interpreter_version() -> str:
+    """Version string of the interpreter that runs user code"""
+    try:
+        result = subprocess.run(
+            [PYTHON_COMMAND, '-c', 'import sys; print(sys.version)'],
+            capture_output=True,
+            text=True,
+            timeout=10
+        )
+        return result.stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return 'unknown'
+
+
+def execution_cache_key(code: str,
+                        inputs: Optional[List[Any]] = None,
+                        line_budget: Optional[int] = None) -> str:
+    """Content address for a run: hash of code, inputs, budget and interpreter version"""
+    payload = json.dumps([code, inputs or [], line_budget, interpreter_version()], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+
+def resolve_line_budget(requested: Any = None) -> int:
+    """Clamp a per-run budget from the request to the configured limits"""
+    try:
+        budget = int(requested) if requested is not None else DEFAULT_LINE_BUDGET
+    except (TypeError, ValueError):
+        budget = DEFAULT_LINE_BUDGET
+    return max(MIN_LINE_BUDGET, min(budget, MAX_LINE_BUDGET))
+
+
+def has_stable_output(result: Dict[str, Any]) -> bool:
+    """Whether a run's output can be cached: no object addresses printed"""
+    return not any(ADDRESS_REPR.search(result.get(field) or '') for field in ('output', 'error'))
+
+
+def run_environment() -> Dict[str, str]:
+    """Environment for the child interpreter"""
+    return dict(os.environ, PYTHONHASHSEED=PYTHON_HASH_SEED)
+
+
+def build_command(script_path: str, line_budget: int) -> List[str]:
+    """Command line that runs a script under the line budget"""
+    return [PYTHON_COMMAND, '-c', RUNNER_SOURCE, script_path, str(line_budget)]
+
+
+def parse_budget_exceeded(returncode: int, stderr: str) -> Optional[Dict[str, Any]]:
+    """Details of an exhausted budget reported by the runner, if any"""
+    if returncode != BUDGET_EXIT_CODE:
+        return None
+
+    for line in reversed(stderr.splitlines()):
+        if line.startswith(BUDGET_MARKER):
+            try:
+                return json.loads(line[len(BUDGET_MARKER):])
+            except ValueError:
+                return None
+    return None
@@ -0,0 +1,124 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import Interaction, Session
+
+COUNTER_COLUMNS = ('interaction_count', 'learn_count', 'code_count', 'tokens_used')
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-session counter increments for a batch of interaction records"""
+    totals: Dict[str, Dict[str, Any]] = {}
+    for record in records:
+        row = totals.setdefault(record['session_id'], {
+            'session_id': record['session_id'],
+            'interaction_count': 0, 'learn_count': 0, 'code_count': 0, 'tokens_used': 0,
+            'last_activity_at': None
+        })
+        row['interaction_count'] += 1
+        if record.get('interaction_type') == 'learn':
+            row['learn_count'] += 1
+        elif record.get('interaction_type') == 'code':
+            row['code_count'] += 1
+        row['tokens_used'] += record.get('tokens_used') or 0
+        created_at = record.get('created_at')
+        if created_at is not None and (row['last_activity_at'] is None or created_at > row['last_activity_at']):
+            row['last_activity_at'] = created_at
+    return list(totals.values())
+
+
+def _dialect_name(connection) -> str:
+    # An ORM session, or a Core connection
+    if hasattr(connection, 'get_bind'):
+        return connection.get_bind().dialect.name
+    return connection.dialect.name
+
+
+def record_interactions(connection, records: Iterable[Dict[str, Any]]):
+    """Add a batch of interactions to their sessions' counters.
+
+    Runs on the caller's connection or session so the counters commit in the
+    same transaction as the interactions themselves. Sessions without a row
+    get one.
+    """
+    rows = summarize(records)
+    if not rows:
+        return
+
+    table = Session.__table__
+    insert = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}.get(_dialect_name(connection))
+
+    if insert is not None:
+        statement = insert(table)
+        set_ = {name: table.c[name] + statement.excluded[name] for name in COUNTER_COLUMNS}
+        set_['last_activity_at'] = func.coalesce(statement.excluded.last_activity_at, table.c.last_activity_at)
+        connection.execute(statement.on_conflict_do_update(index_elements=['session_id'], set_=set_), rows)
+        return
+
+    # Other databases: update, then create the rows that did not exist
+    for row in rows:
+        values = {name: table.c[name] + row[name] for name in COUNTER_COLUMNS}
+        if row['last_activity_at'] is not None:
+            values['last_activity_at'] = row['last_activity_at']
+        result = connection.execute(table.update().where(table.c.session_id == row['session_id']).values(values))
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(row))
+
+
+def reconcile(connection, archived: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, int]:
+    """Recompute every session's counters from the interactions table.
+
+    archived holds the counters of interactions moved out of the table (see
+    InteractionArchive.session_totals), which still count. Counters only
+    drift if a write was lost or made outside the app. Run this while writes
+    are quiet: a row written between the scan and the update is counted once
+    it is reconciled again.
+    """
+    interactions = Interaction.__table__
+    sessions = Session.__table__
+
+    actual = {}
+    query = select(
+        interactions.c.session_id,
+        func.count(),
+        func.sum(case((interactions.c.interaction_type == 'learn', 1), else_=0)),
+        func.sum(case((interactions.c.interaction_type == 'code', 1), else_=0)),
+        func.coalesce(func.sum(interactions.c.tokens_used), 0),
+        func.max(interactions.c.created_at),
+    ).group_by(interactions.c.session_id)
+    for session_id, total, learn, code, tokens, last in connection.execute(query):
+        actual[session_id] = {
+            'interaction_count': total, 'learn_count': learn or 0, 'code_count': code or 0,
+            'tokens_used': tokens or 0, 'last_activity_at': last
+        }
+
+    for session_id, values in (archived or {}).items():
+        expected = actual.setdefault(session_id, {**dict.fromkeys(COUNTER_COLUMNS, 0), 'last_activity_at': None})
+        for name in COUNTER_COLUMNS:
+            expected[name] += values[name]
+        if values['last_activity_at'] and (expected['last_activity_at'] is None
+                                           or values['last_activity_at'] > expected['last_activity_at']):
+            expected['last_activity_at'] = values['last_activity_at']
+
+    corrected = 0
+    stored = connection.execute(select(
+        sessions.c.session_id, *[sessions.c[name] for name in COUNTER_COLUMNS], sessions.c.last_activity_at
+    )).all()
+    for row in stored:
+        expected = actual.pop(row.session_id, None) or dict.fromkeys(COUNTER_COLUMNS, 0)
+        current = {name: getattr(row, name) for name in COUNTER_COLUMNS}
+        if any(current[name] != expected[name] for name in COUNTER_COLUMNS) or (
+                expected.get('last_activity_at') and row.last_activity_at != expected['last_activity_at']):
+            values = {name: expected[name] for name in COUNTER_COLUMNS}
+            if expected.get('last_activity_at'):
+                values['last_activity_at'] = expected['last_activity_at']
+            connection.execute(sessions.update().where(sessions.c.session_id == row.session_id).values(values))
+            corrected += 1
+
+    # Interactions whose session never got a row
+    for session_id, values in actual.items():
+        connection.execute(sessions.insert().values(session_id=session_id, **values))
+
+    return {'checked': len(stored), 'corrected': corrected, 'created': len(actual)}
@@ -0,0 +1,331 @@
+import gzip
+import importlib.util
+import json
+import logging
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+def _pyspellchecker_words() -> Optional[str]:
+    # The English frequency list that ships with pyspellchecker; only the data file is used
+    spec = importlib.util.find_spec('spellchecker')
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    return os.path.join(list(spec.submodule_search_locations)[0], 'resources', 'en.json.gz')
+
+
+# Word list used for spelling: one word per line, optionally followed by a
+# frequency count, or a gzipped JSON object of word frequencies. The first
+# readable candidate wins. Without one, only the rule checks run.
+DICTIONARY_PATHS = [path for path in (
+    os.environ.get('SPELLCHECK_DICTIONARY'),
+    _pyspellchecker_words(),
+    '/usr/share/dict/words',
+    '/usr/dict/words',
+) if path]
+
+# Words indexed, most frequent first where the list has frequencies; bounds
+# the index's build time and memory (about 4 MB and a third of a second for
+# the default)
+SPELLCHECK_MAX_WORDS = int(os.environ.get('SPELLCHECK_MAX_WORDS', 30_000))
+
+# Edit distance covered by the symmetric-delete index; each extra edit
+# multiplies the index size, so 1 is the default
+MAX_EDIT_DISTANCE = int(os.environ.get('SPELLCHECK_MAX_DISTANCE', 1))
+
+# Index keys pack a deletion's hash above the word's rank in 64 bits
+RANK_BITS = 20
+RANK_MASK = (1 << RANK_BITS) - 1
+HASH_MASK = (1 << (64 - RANK_BITS)) - 1
+
+# Sentences longer than this many words are flagged
+MAX_SENTENCE_WORDS = int(os.environ.get('GRAMMAR_MAX_SENTENCE_WORDS', 35))
+
+MIN_WORD_LENGTH = 3
+MAX_SUGGESTIONS = 3
+
+# Forms of "to be" followed by a past participle suggest passive voice
+BE_FORMS = {'am', 'is', 'are', 'was', 'were', 'be', 'been', 'being'}
+IRREGULAR_PARTICIPLES = {
+    'begun', 'bitten', 'broken', 'brought', 'built', 'bought', 'caught', 'chosen', 'done', 'drawn',
+    'driven', 'eaten', 'fallen', 'felt', 'forgotten', 'found', 'given', 'gone', 'grown', 'heard',
+    'held', 'hidden', 'kept', 'known', 'laid', 'led', 'left', 'lost', 'made', 'meant', 'met', 'paid',
+    'put', 'read', 'run', 'said', 'seen', 'sent', 'set', 'shown', 'shut', 'sold', 'spoken', 'spent',
+    'stolen', 'taken', 'taught', 'thought', 'told', 'understood', 'won', 'worn', 'written'
+}
+# Common -ed words that are adjectives after "to be" rather than passives
+NOT_PARTICIPLES = {'tired', 'interested', 'excited', 'bored', 'married', 'used', 'supposed', 'scared', 'need'}
+
+_WORD = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?")
+_SENTENCE_TOKEN = re.compile(r"[A-Za-z]+(?:'[A-Za-z]+)?|[.!?]+(?=\s|$)")
+# Inline code, URLs and e-mail addresses are never spellchecked
+_SKIP_SPANS = re.compile(r'`[^`]*`|https?://\S+|\S+@\S+')
+
+
+class SymmetricDeleteIndex:
+    """Spelling index in the symmetric-delete style.
+
+    Every dictionary word is indexed under each string reachable from it by
+    up to max_distance deletions. A misspelling's own deletions then meet its
+    candidates in the index without generating inserts or substitutions.
+
+    The deletions are not stored: each is kept as its hash packed with the
+    word's rank into one sorted array, about 8 bytes per entry. A hash
+    collision only adds a candidate, which the edit-distance check discards.
+    """
+
+    def __init__(self, words: List[str], max_distance: int = MAX_EDIT_DISTANCE):
+        self.max_distance = max_distance
+        self.ranked: List[str] = []
+        self.words: Set[str] = set()
+
+        for word in words:
+            if word not in self.words:
+                self.words.add(word)
+                self.ranked.append(word)
+
+        self._keys = array('Q', sorted(
+            (self._hash(variant) << RANK_BITS) | rank
+            for rank, word in enumerate(self.ranked[:1 << RANK_BITS])
+            for variant in self._deletions(word)
+        ))
+
+    @staticmethod
+    def _hash(variant: str) -> int:
+        return hash(variant) & HASH_MASK
+
+    def _deletions(self, word: str) -> Set[str]:
+        variants = {word}
+        frontier = {word}
+        for _ in range(self.max_distance):
+            frontier = {term[:i] + term[i + 1:] for term in frontier for i in range(len(term))}
+            variants |= frontier
+        return variants
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.words
+
+    def _ranks(self, variant: str) -> Iterator[int]:
+        prefix = self._hash(variant)
+        position = bisect_left(self._keys, prefix << RANK_BITS)
+        while position < len(self._keys) and self._keys[position] >> RANK_BITS == prefix:
+            yield self._keys[position] & RANK_MASK
+            position += 1
+
+    def suggest(self, word: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        """Closest dictionary words, nearest first, then by dictionary order"""
+        ranks = set()
+        for variant in self._deletions(word):
+            ranks.update(self._ranks(variant))
+
+        scored = []
+        for rank in ranks:
+            candidate = self.ranked[rank]
+            distance = edit_distance(word, candidate, self.max_distance)
+            if distance <= self.max_distance:
+                scored.append((distance, rank, candidate))
+        return [candidate for _, _, candidate in sorted(scored)[:limit]]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, giving up once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+_index: Optional[SymmetricDeleteIndex] = None
+_index_ready = threading.Event()
+_index_lock = threading.Lock()
+_loader = None
+
+
+def load_words(path: str) -> List[str]:
+    """Lower-case words from a word list, in file order or most frequent first"""
+    if path.endswith('.json.gz'):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            frequencies = json.load(handle)
+        ranked = sorted(frequencies.items(), key=lambda item: -item[1])
+        return [word.lower() for word, _ in ranked if word.isalpha()]
+
+    words = []
+    with open(path, encoding='utf-8', errors='ignore') as handle:
+        for line in handle:
+            parts = line.split()
+            if parts and parts[0].isalpha():
+                words.append(parts[0].lower())
+    return words
+
+
+def _build_index():
+    global _index
+    try:
+        path = next((path for path in DICTIONARY_PATHS if os.path.isfile(path)), None)
+        if path is None:
+            logger.warning("No spelling dictionary found (set SPELLCHECK_DICTIONARY or install "
+                           "pyspellchecker); only the rule checks will run")
+            return
+        started = time.perf_counter()
+        words = load_words(path)[:SPELLCHECK_MAX_WORDS]
+        _index = SymmetricDeleteIndex(words)
+        logger.info(f"Spelling index: {len(words)} words from {path} in {time.perf_counter() - started:.1f}s")
+    except Exception as e:
+        logger.error(f"Could not build the spelling index: {e}")
+    finally:
+        _index_ready.set()
+
+
+def start_loading():
+    """Build the spelling index on a background thread, once per process"""
+    global _loader
+    with _index_lock:
+        if _index_ready.is_set():
+            return
+        # Threads do not survive a fork, so a worker forked mid-build starts its own
+        if _loader is not None and _loader[0] == os.getpid() and _loader[1].is_alive():
+            return
+        thread = threading.Thread(target=_build_index, name='spellcheck-index', daemon=True)
+        _loader = (os.getpid(), thread)
+        thread.start()
+
+
+def get_index(timeout: Optional[float] = 0) -> Optional[SymmetricDeleteIndex]:
+    """The spelling index; None without a dictionary or, after timeout seconds, while it is still being built"""
+    if not _index_ready.is_set():
+        start_loading()
+        _index_ready.wait(timeout)
+    return _index
+
+
+def _sentences(content: str) -> Iterator[Dict[str, Any]]:
+    """Sentences with the line each starts on and their words"""
+    words: List[str] = []
+    start = None
+
+    for number, line in enumerate(content.split('\n'), start=1):
+        if not line.strip() and words:
+            # A blank line ends the sentence even without punctuation
+            yield {'line': start, 'words': words}
+            words = []
+        for match in _SENTENCE_TOKEN.finditer(line):
+            token = match.group(0)
+            if token[0] in '.!?':
+                if words:
+                    yield {'line': start, 'words': words}
+                    words = []
+            else:
+                if not words:
+                    start = number
+                words.append(token)
+
+    if words:
+        yield {'line': start, 'words': words}
+
+
+def longest_sentence(content: str) -> int:
+    """Word count of the longest sentence in content"""
+    return max((len(sentence['words']) for sentence in _sentences(content)), default=0)
+
+
+def check_spelling(content: str) -> List[Dict[str, Any]]:
+    index = get_index()
+    if index is None:
+        return []
+
+    findings = []
+    seen = set()
+    for number, line in enumerate(content.split('\n'), start=1):
+        for match in _WORD.finditer(_SKIP_SPANS.sub(' ', line)):
+            word = match.group(0)
+            lower = word.lower()
+            # Skip short words, acronyms and capitalized words (usually names)
+            if len(word) < MIN_WORD_LENGTH or word[0].isupper() or "'" in word:
+                continue
+            if lower in index or (number, lower) in seen:
+                continue
+            seen.add((number, lower))
+
+            suggestions = index.suggest(lower)
+            if not suggestions:
+                # Far from every dictionary word: likely a name or jargon
+                continue
+            findings.append({
+                'type': 'error',
+                'line': number,
+                'message': f"Line {number}: '{word}' may be misspelled (did you mean {', '.join(suggestions)}?)"
+            })
+    return findings
+
+
+def check_repeated_words(content: str) -> List[Dict[str, Any]]:
+    findings = []
+    for number, line in enumerate(content.split('\n'), start=1):
+        previous = None
+        flagged = False
+        for match in _WORD.finditer(line):
+            word = match.group(0).lower()
+            # One finding per run of repeats
+            if word == previous and not flagged:
+                flagged = True
+                findings.append({
+                    'type': 'error',
+                    'line': number,
+                    'message': f"Line {number}: Repeated word '{match.group(0)}'"
+                })
+            elif word != previous:
+                flagged = False
+            previous = word
+    return findings
+
+
+def check_sentences(content: str) -> List[Dict[str, Any]]:
+    findings = []
+    for sentence in _sentences(content):
+        words = [word.lower() for word in sentence['words']]
+        line = sentence['line']
+
+        if len(words) > MAX_SENTENCE_WORDS:
+            findings.append({
+                'type': 'warning',
+                'line': line,
+                'message': f"Line {line}: Long sentence ({len(words)} words); consider splitting it"
+            })
+
+        for first, second in zip(words, words[1:]):
+            if first in BE_FORMS and second not in NOT_PARTICIPLES and (
+                    second in IRREGULAR_PARTICIPLES or (second.endswith('ed') and len(second) > 4)):
+                findings.append({
+                    'type': 'info',
+                    'line': line,
+                    'message': f"Line {line}: '{first} {second}' may be passive voice; an active verb is often clearer"
+                })
+                break
+    return findings
+
+
+def check_text(content: str) -> List[Dict[str, Any]]:
+    """Offline spelling and rule checks, anchored to lines and sorted by line"""
+    findings = check_spelling(content) + check_repeated_words(content) + check_sentences(content)
+    for finding in findings:
+        finding['source'] = 'local'
+    return sorted(findings, key=lambda finding: finding['line'])
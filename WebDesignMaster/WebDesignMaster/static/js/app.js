@@ -1690,7 +1690,8 @@ class UndrstandingApp {
                 },
                 body: JSON.stringify({
                     code: code,
-                    language: 'python'
+                    language: 'python',
+                    ...this.visualizationTraceOptions()
                 })
             });
 
@@ -1775,7 +1776,8 @@ class UndrstandingApp {
                 },
                 body: JSON.stringify({
                     code: content,
-                    language: 'python'
+                    language: 'python',
+                    ...this.visualizationTraceOptions()
                 })
             });
 
@@ -2558,7 +2560,8 @@ class UndrstandingApp {
                 },
                 body: JSON.stringify({
                     code: code,
-                    language: 'python'
+                    language: 'python',
+                    ...this.visualizationTraceOptions()
                 })
             });
 
@@ -7901,7 +7904,106 @@ if __name__ == "__main__":
     }
 
     // Visualization methods
+    visualizationTraceOptions() {
+        // Generate the steps here when the generators are loaded: a spec is a
+        // few hundred bytes whatever the trace length. The server answers with
+        // paged delta steps instead if our spec version is not its own.
+        if (typeof TraceGenerators === 'undefined') {
+            return { trace_format: 'delta' };
+        }
+        return { trace_format: 'client', client_spec_version: TraceGenerators.SPEC_VERSION };
+    }
+
+    unpackTrace(data) {
+        // Mirrors unpack_trace in visualization.py: magic, version, a string
+        // table, then tagged values (zigzag varints, lists, float64s, nulls)
+        const bytes = Uint8Array.from(atob(data.packed), c => c.charCodeAt(0));
+        const view = new DataView(bytes.buffer);
+        let pos = 0;
+
+        const readVarint = () => {
+            let result = 0;
+            let scale = 1;
+            for (;;) {
+                const byte = bytes[pos++];
+                result += (byte & 0x7f) * scale;
+                if (!(byte & 0x80)) {
+                    return result;
+                }
+                scale *= 128;
+            }
+        };
+        const readValue = () => {
+            const tag = bytes[pos++];
+            if (tag === 3) {
+                return null;
+            }
+            if (tag === 0) {
+                const raw = readVarint();
+                return raw % 2 ? -(raw + 1) / 2 : raw / 2;
+            }
+            if (tag === 2) {
+                const value = view.getFloat64(pos, true);
+                pos += 8;
+                return value;
+            }
+            if (tag === 1) {
+                const length = readVarint();
+                return Array.from({ length }, readValue);
+            }
+            throw new Error(`Unknown packed value tag ${tag}`);
+        };
+
+        if (String.fromCharCode(...bytes.subarray(0, 4)) !== 'VZT1') {
+            throw new Error('Not a packed visualization trace');
+        }
+        pos = 4;
+        const version = readVarint();
+        const strings = Array.from({ length: readVarint() }, () => {
+            const length = readVarint();
+            const text = new TextDecoder().decode(bytes.subarray(pos, pos + length));
+            pos += length;
+            return text;
+        });
+
+        const array = readValue();
+        const steps = Array.from({ length: readVarint() }, () => {
+            const step = { type: strings[readVarint()] };
+            const fieldCount = readVarint();
+            for (let i = 0; i < fieldCount; i++) {
+                const key = strings[readVarint()];
+                step[key] = readValue();
+            }
+            return step;
+        });
+        const keyframes = readValue();
+
+        const { packed, ...rest } = data;
+        return { ...rest, encoding: 'delta', version, array, steps, keyframes };
+    }
+
+    prepareVisualizationData(type, data) {
+        if (data && data.encoding === 'packed') {
+            try {
+                return this.unpackTrace(data);
+            } catch (error) {
+                console.error(`Could not decode packed visualization: ${error.message}`);
+                return null;
+            }
+        }
+        if (!data || data.encoding !== 'client') {
+            return data;
+        }
+        if (!TraceGenerators.supports(data)) {
+            console.error(`Unsupported visualization spec: ${data.generator} v${data.version}`);
+            return null;
+        }
+        // Searches are short and their views render every step up front
+        return TraceGenerators.expand(data, type === 'searching' ? Infinity : TraceGenerators.PAGE_SIZE);
+    }
+
     showVisualization(type, data) {
+        data = this.prepareVisualizationData(type, data);
         const visualizationContainer = document.getElementById('visualizationContainer');
         const placeholder = document.getElementById('visualizationPlaceholder');
 
@@ -7955,7 +8057,7 @@ if __name__ == "__main__":
         container.innerHTML = `
             <div class="visualization-info">
                 <h5>${algorithm} Algorithm Visualization</h5>
-                <p>Original array: [${array.join(', ')}] - ${steps.length} steps to sort</p>
+                <p>Original array: [${array.join(', ')}] - ${steps.length}${data.next_cursor != null ? '+' : ''} steps to sort</p>
                 <div class="step-description" id="stepDescription">
                     <span class="step-counter">Ready to begin</span>
                     <span class="step-text">Click "Next" or "Play" to start the visualization</span>
@@ -8020,6 +8122,11 @@ if __name__ == "__main__":
             array: [...array],
             originalArray: [...array],
             steps: steps,
+            keyframes: data.keyframes || [],
+            traceId: data.trace_id || null,
+            stepSource: data.stepSource || null,
+            nextCursor: data.trace_id || data.stepSource ? data.next_cursor : null,
+            pagePromise: null,
             currentStep: 0,
             isPlaying: false,
             playInterval: null,
@@ -8097,18 +8204,78 @@ if __name__ == "__main__":
         resetBtn.addEventListener('click', () => this.resetVisualization(container));
     }
 
+    visualizationFinished() {
+        return this.vizState.currentStep >= this.vizState.steps.length && this.vizState.nextCursor === null;
+    }
+
+    loadVisualizationPage(state = this.vizState) {
+        // Long traces arrive in pages; fetch the next one once and share the pending request
+        if (state.pagePromise) {
+            return state.pagePromise;
+        }
+
+        if (state.stepSource) {
+            // Client-computed trace: generate the next page locally
+            const steps = TraceGenerators.take(state.stepSource, TraceGenerators.PAGE_SIZE);
+            state.steps.push(...steps);
+            if (steps.length < TraceGenerators.PAGE_SIZE) {
+                state.stepSource = null;
+                state.nextCursor = null;
+            } else {
+                state.nextCursor = state.steps.length;
+            }
+            return Promise.resolve(steps.length > 0);
+        }
+
+        state.pagePromise = fetch(`/api/visualization/${state.traceId}?cursor=${state.nextCursor}`)
+            .then(response => response.ok ? response.json() : null)
+            .then(page => {
+                if (!page) {
+                    state.nextCursor = null;
+                    return false;
+                }
+                state.keyframes.push([page.cursor, page.array], ...(page.keyframes || []));
+                state.steps.push(...page.steps);
+                state.nextCursor = page.next_cursor;
+                return true;
+            })
+            .catch(() => {
+                state.nextCursor = null;
+                return false;
+            })
+            .finally(() => {
+                state.pagePromise = null;
+            });
+        return state.pagePromise;
+    }
+
     nextVisualizationStep(container) {
-        if (!this.vizState || this.vizState.currentStep >= this.vizState.steps.length) {
+        if (!this.vizState || this.visualizationFinished()) {
             this.completeVisualization(container);
             return;
         }
 
+        if (this.vizState.currentStep >= this.vizState.steps.length) {
+            // Wait for the next page, then continue from where we stopped
+            const waitingAt = this.vizState.currentStep;
+            this.loadVisualizationPage().then(() => {
+                if (this.vizState.currentStep === waitingAt) {
+                    this.nextVisualizationStep(container);
+                }
+            });
+            return;
+        }
+
+        // Prefetch before playback reaches the end of the loaded steps
+        if (this.vizState.nextCursor !== null && this.vizState.steps.length - this.vizState.currentStep < 50) {
+            this.loadVisualizationPage();
+        }
+
         const step = this.vizState.steps[this.vizState.currentStep];
         const arrayContainer = container.querySelector('.visualization-array');
 
-        // First update the array if step contains new array state
-        if (step.array) {
-            this.vizState.array = [...step.array];
+        // First update the array if the step changes it
+        if (this.applySortStep(this.vizState.array, step)) {
             this.renderArrayElements(this.vizState.array, arrayContainer);
         }
 
@@ -8316,21 +8483,53 @@ if __name__ == "__main__":
         this.updateVisualizationControls(container);
     }
 
+    applySortStep(array, step) {
+        // Full-format steps carry a snapshot of the whole array
+        if (step.array) {
+            array.splice(0, array.length, ...step.array);
+            return true;
+        }
+
+        // Delta steps carry only their change: swaps exchange their indices, writes assign values
+        let changed = false;
+        if (step.type === 'swap' && step.indices) {
+            const [i, j] = step.indices;
+            [array[i], array[j]] = [array[j], array[i]];
+            changed = true;
+        }
+        if (step.writes) {
+            step.writes.forEach(([index, value]) => {
+                array[index] = value;
+            });
+            changed = true;
+        }
+        return changed;
+    }
+
+    sortArrayAt(stepIndex) {
+        // Start from the nearest keyframe before stepIndex and replay the deltas after it
+        let start = 0;
+        let array = [...this.vizState.originalArray];
+        (this.vizState.keyframes || []).forEach(([index, snapshot]) => {
+            if (index <= stepIndex && index > start) {
+                start = index;
+                array = [...snapshot];
+            }
+        });
+
+        for (let i = start; i < stepIndex; i++) {
+            this.applySortStep(array, this.vizState.steps[i]);
+        }
+        return array;
+    }
+
     previousVisualizationStep(container) {
         if (!this.vizState || this.vizState.currentStep <= 0) return;
 
         this.vizState.currentStep--;
 
-        // Get the previous step's array state
-        if (this.vizState.currentStep > 0) {
-            const prevStep = this.vizState.steps[this.vizState.currentStep - 1];
-            if (prevStep.array) {
-                this.vizState.array = [...prevStep.array];
-            }
-        } else {
-            // Reset to original array
-            this.vizState.array = [...this.vizState.originalArray];
-        }
+        // Rebuild the array state as it was after the previous step
+        this.vizState.array = this.sortArrayAt(this.vizState.currentStep);
 
         const arrayContainer = container.querySelector('.visualization-array');
         this.renderArrayElements(this.vizState.array, arrayContainer);
@@ -8362,7 +8561,7 @@ if __name__ == "__main__":
         playPauseBtn.innerHTML = '<i class="fas fa-pause"></i>Pause';
 
         this.vizState.playInterval = setInterval(() => {
-            if (this.vizState.currentStep >= this.vizState.steps.length) {
+            if (this.visualizationFinished()) {
                 this.pauseVisualization(container);
                 return;
             }
@@ -8404,14 +8603,14 @@ if __name__ == "__main__":
         const stepDescription = container.querySelector('#stepDescription');
 
         prevBtn.disabled = this.vizState.currentStep <= 0;
-        nextBtn.disabled = this.vizState.currentStep >= this.vizState.steps.length;
+        nextBtn.disabled = this.visualizationFinished();
 
         // Update step description
         if (stepDescription) {
             const stepCounter = stepDescription.querySelector('.step-counter');
             const stepText = stepDescription.querySelector('.step-text');
 
-            if (this.vizState.currentStep >= this.vizState.steps.length) {
+            if (this.visualizationFinished()) {
                 stepCounter.textContent = 'Complete!';
                 stepText.textContent = 'Array is now sorted';
             } else if (this.vizState.currentStep === 0) {
@@ -8419,12 +8618,13 @@ if __name__ == "__main__":
                 stepText.textContent = 'Click "Next" or "Play" to start the visualization';
             } else {
                 const step = this.vizState.steps[this.vizState.currentStep - 1];
-                stepCounter.textContent = `Step ${this.vizState.currentStep} of ${this.vizState.steps.length}`;
+                const more = this.vizState.nextCursor !== null ? '+' : '';
+                stepCounter.textContent = `Step ${this.vizState.currentStep} of ${this.vizState.steps.length}${more}`;
                 stepText.textContent = this.getStepDescription(step);
             }
         }
 
-        if (this.vizState.currentStep >= this.vizState.steps.length) {
+        if (this.visualizationFinished()) {
             playPauseBtn.innerHTML = '<i class="fas fa-check"></i>Complete';
             playPauseBtn.disabled = true;
         } else {
@@ -8865,7 +9065,8 @@ if __name__ == "__main__":
                 },
                 body: JSON.stringify({
                     code: code,
-                    language: 'python'
+                    language: 'python',
+                    ...this.visualizationTraceOptions()
                 })
             });
 
@@ -8894,6 +9095,7 @@ if __name__ == "__main__":
     }
 
     showVisualizationInContainer(type, data, container) {
+        data = this.prepareVisualizationData(type, data);
         switch (type) {
             case 'sorting':
                 this.visualizeSortingInContainer(data, container);
@@ -8919,7 +9121,7 @@ if __name__ == "__main__":
         container.innerHTML = `
             <div class="visualization-info">
                 <h5 style="font-size: 18px;">Sorting Algorithm Visualization</h5>
-                <p style="font-size: 16px;">Original array: [${array.join(', ')}] - ${steps.length} steps to sort</p>
+                <p style="font-size: 16px;">Original array: [${array.join(', ')}] - ${steps.length}${data.next_cursor != null ? '+' : ''} steps to sort</p>
             </div>
         `;
 
@@ -8980,6 +9182,11 @@ if __name__ == "__main__":
             array: [...array],
             originalArray: [...array],
             steps: steps,
+            keyframes: data.keyframes || [],
+            traceId: data.trace_id || null,
+            stepSource: data.stepSource || null,
+            nextCursor: data.trace_id || data.stepSource ? data.next_cursor : null,
+            pagePromise: null,
             currentStep: 0,
             isPlaying: false,
             playInterval: null
@@ -9041,7 +9248,7 @@ if __name__ == "__main__":
         container.innerHTML = `
             <div class="visualization-info">
                 <h5 style="font-size: 18px;">Binary Search Visualization</h5>
-                <p style="font-size: 16px;">Target: ${target} in sorted array [${array.join(', ')}] - ${steps.length} steps to search</p>
+                <p style="font-size: 16px;">Target: ${target} in sorted array [${array.join(', ')}] - ${steps.length}${data.next_cursor != null ? '+' : ''} steps to search</p>
             </div>
         `;
 
@@ -9102,6 +9309,10 @@ if __name__ == "__main__":
             array: array,
             target: target,
             steps: steps,
+            keyframes: [],
+            traceId: data.trace_id || null,
+            nextCursor: data.trace_id ? data.next_cursor : null,
+            pagePromise: null,
             currentStep: 0,
             isPlaying: false,
             playInterval: null
@@ -9150,7 +9361,7 @@ if __name__ == "__main__":
         container.innerHTML = `
             <div class="visualization-info">
                 <h5>Binary Search Visualization</h5>
-                <p>Target: ${target} in sorted array [${array.join(', ')}] - ${steps.length} steps to search</p>
+                <p>Target: ${target} in sorted array [${array.join(', ')}] - ${steps.length}${data.next_cursor != null ? '+' : ''} steps to search</p>
             </div>
         `;
 
@@ -9189,6 +9400,10 @@ if __name__ == "__main__":
             array: array,
             target: target,
             steps: steps,
+            keyframes: [],
+            traceId: data.trace_id || null,
+            nextCursor: data.trace_id ? data.next_cursor : null,
+            pagePromise: null,
             currentStep: 0,
             isPlaying: false,
             playInterval: null
@@ -9222,12 +9437,28 @@ if __name__ == "__main__":
         resetBtn.addEventListener('click', () => this.resetSearchVisualization(container));
     }
 
+    searchFinished() {
+        return this.searchState.currentStep >= this.searchState.steps.length && this.searchState.nextCursor === null;
+    }
+
     nextSearchStep(container) {
-        if (!this.searchState || this.searchState.currentStep >= this.searchState.steps.length) {
+        if (!this.searchState || this.searchFinished()) {
             this.completeSearchVisualization(container);
             return;
         }
 
+        if (this.searchState.currentStep >= this.searchState.steps.length) {
+            // A long linear search arrives in pages; continue once the next one is here
+            const state = this.searchState;
+            const waitingAt = state.currentStep;
+            this.loadVisualizationPage(state).then(() => {
+                if (this.searchState === state && state.currentStep === waitingAt) {
+                    this.nextSearchStep(container);
+                }
+            });
+            return;
+        }
+
         const step = this.searchState.steps[this.searchState.currentStep];
         const arrayContainer = container.querySelector('.visualization-array');
         const elements = arrayContainer.querySelectorAll('.visualization-element');
@@ -9347,7 +9578,7 @@ if __name__ == "__main__":
         playBtn.innerHTML = '<i class="fas fa-pause"></i>Pause';
 
         this.searchState.playInterval = setInterval(() => {
-            if (this.searchState.currentStep >= this.searchState.steps.length) {
+            if (this.searchFinished()) {
                 this.pauseSearchVisualization(container);
                 return;
             }
@@ -9387,9 +9618,9 @@ if __name__ == "__main__":
         const playBtn = container.querySelector('#playSearchBtn');
 
         prevBtn.disabled = this.searchState.currentStep <= 0;
-        nextBtn.disabled = this.searchState.currentStep >= this.searchState.steps.length;
+        nextBtn.disabled = this.searchFinished();
 
-        if (this.searchState.currentStep >= this.searchState.steps.length) {
+        if (this.searchFinished()) {
             playBtn.innerHTML = '<i class="fas fa-check"></i>Complete';
             playBtn.disabled = true;
         } else {
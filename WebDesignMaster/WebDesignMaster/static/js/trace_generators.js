@@ -0,0 +1,271 @@
+// Step generators for client-computed visualizations.
+//
+// These mirror the generators in visualization.py step for step; the Python
+// versions are the reference (see benchmarks/trace_conformance.py). A trace
+// spec from the server names one of these and supplies the array and target.
+
+const TraceGenerators = {
+    // Bump together with CLIENT_SPEC_VERSION in visualization.py
+    SPEC_VERSION: 1,
+
+    // Steps generated per page, matching the server's VIS_TRACE_PAGE_SIZE default
+    PAGE_SIZE: 500,
+
+    *bubble_sort(array) {
+        const arr = [...array];
+        const n = arr.length;
+
+        for (let i = 0; i < n; i++) {
+            let swapped = false;
+            for (let j = 0; j < n - i - 1; j++) {
+                yield { type: 'compare', indices: [j, j + 1] };
+
+                if (arr[j] > arr[j + 1]) {
+                    [arr[j], arr[j + 1]] = [arr[j + 1], arr[j]];
+                    yield { type: 'swap', indices: [j, j + 1] };
+                    swapped = true;
+                }
+            }
+
+            if (!swapped) {
+                break;
+            }
+        }
+
+        yield { type: 'complete' };
+    },
+
+    *selection_sort(array) {
+        const arr = [...array];
+        const n = arr.length;
+
+        for (let i = 0; i < n; i++) {
+            let minIdx = i;
+            yield { type: 'select', index: i };
+
+            for (let j = i + 1; j < n; j++) {
+                yield { type: 'compare', indices: [minIdx, j] };
+                if (arr[j] < arr[minIdx]) {
+                    minIdx = j;
+                    yield { type: 'new_min', index: minIdx };
+                }
+            }
+
+            if (minIdx !== i) {
+                [arr[i], arr[minIdx]] = [arr[minIdx], arr[i]];
+                yield { type: 'swap', indices: [i, minIdx] };
+            }
+        }
+
+        yield { type: 'complete' };
+    },
+
+    *insertion_sort(array) {
+        const arr = [...array];
+
+        for (let i = 1; i < arr.length; i++) {
+            yield { type: 'select', index: i };
+
+            let j = i;
+            while (j > 0) {
+                yield { type: 'compare', indices: [j - 1, j] };
+                if (arr[j - 1] <= arr[j]) {
+                    break;
+                }
+                [arr[j - 1], arr[j]] = [arr[j], arr[j - 1]];
+                yield { type: 'swap', indices: [j - 1, j] };
+                j--;
+            }
+        }
+
+        yield { type: 'complete' };
+    },
+
+    *quick_sort(array) {
+        const arr = [...array];
+
+        function* partition(low, high) {
+            const pivotIndex = high;
+            const pivotValue = arr[high];
+
+            yield { type: 'select_pivot', pivot_index: pivotIndex, left: low, right: high };
+
+            let i = low - 1;
+
+            for (let j = low; j < high; j++) {
+                yield { type: 'partition_compare', comparing_index: j, pivot_index: pivotIndex };
+
+                if (arr[j] <= pivotValue) {
+                    i++;
+                    if (i !== j) {
+                        [arr[i], arr[j]] = [arr[j], arr[i]];
+                        yield { type: 'swap', indices: [i, j] };
+                    }
+                    yield { type: 'partition_move', element_index: i, pivot_index: pivotIndex };
+                } else {
+                    yield { type: 'partition_greater', element_index: j, pivot_index: pivotIndex };
+                }
+            }
+
+            // Place pivot in its final position
+            i++;
+            if (i !== high) {
+                [arr[i], arr[high]] = [arr[high], arr[i]];
+                yield { type: 'swap', indices: [i, high] };
+            }
+
+            yield { type: 'place_pivot', final_position: i };
+
+            return i;
+        }
+
+        function* quickSort(low, high) {
+            if (low < high) {
+                const pi = yield* partition(low, high);
+                yield* quickSort(low, pi - 1);
+                yield* quickSort(pi + 1, high);
+            }
+        }
+
+        yield* quickSort(0, arr.length - 1);
+        yield { type: 'complete' };
+    },
+
+    *merge_sort(array) {
+        const arr = [...array];
+        const range = (start, end) => Array.from({ length: Math.max(end - start, 0) }, (_, k) => start + k);
+
+        function* merge(left, mid, right) {
+            const leftArr = arr.slice(left, mid + 1);
+            const rightArr = arr.slice(mid + 1, right + 1);
+
+            yield { type: 'divide', left_half: range(left, mid + 1), right_half: range(mid + 1, right + 1) };
+
+            let i = 0;
+            let j = 0;
+            let k = left;
+            const merged = [];
+
+            while (i < leftArr.length && j < rightArr.length) {
+                yield { type: 'merge_compare', left_index: left + i, right_index: mid + 1 + j };
+
+                let value;
+                if (leftArr[i] <= rightArr[j]) {
+                    value = leftArr[i++];
+                } else {
+                    value = rightArr[j++];
+                }
+                merged.push(value);
+                yield { type: 'merge_place', target_index: k, source_value: value, merge_range: [left, right] };
+                k++;
+            }
+
+            for (const value of leftArr.slice(i).concat(rightArr.slice(j))) {
+                merged.push(value);
+                yield { type: 'merge_place', target_index: k, source_value: value, merge_range: [left, right] };
+                k++;
+            }
+
+            // Copy merged values back, recording only the positions that changed
+            const writes = [];
+            merged.forEach((value, offset) => {
+                if (arr[left + offset] !== value) {
+                    arr[left + offset] = value;
+                    writes.push([left + offset, value]);
+                }
+            });
+
+            const step = { type: 'merge_complete', merged_range: [left, right] };
+            if (writes.length) {
+                step.writes = writes;
+            }
+            yield step;
+        }
+
+        function* mergeSort(left, right) {
+            if (left < right) {
+                const mid = Math.floor((left + right) / 2);
+                yield* mergeSort(left, mid);
+                yield* mergeSort(mid + 1, right);
+                yield* merge(left, mid, right);
+            }
+        }
+
+        yield* mergeSort(0, arr.length - 1);
+        yield { type: 'complete' };
+    },
+
+    *linear_search(array, target) {
+        for (let i = 0; i < array.length; i++) {
+            yield { type: 'compare', index: i, value: array[i], target: target };
+            if (array[i] === target) {
+                yield { type: 'found', index: i, value: array[i] };
+                return;
+            }
+        }
+
+        yield { type: 'not_found', target: target };
+    },
+
+    *binary_search(array, target) {
+        const arr = [...array].sort((a, b) => a - b);
+        let left = 0;
+        let right = arr.length - 1;
+
+        while (left <= right) {
+            const mid = Math.floor((left + right) / 2);
+            yield { type: 'compare', index: mid, value: arr[mid], target: target, left: left, right: right };
+
+            if (arr[mid] === target) {
+                yield { type: 'found', index: mid, value: arr[mid] };
+                return;
+            } else if (arr[mid] < target) {
+                left = mid + 1;
+                yield { type: 'eliminate_left', new_left: left, right: right };
+            } else {
+                right = mid - 1;
+                yield { type: 'eliminate_right', left: left, new_right: right };
+            }
+        }
+
+        yield { type: 'not_found', target: target };
+    },
+
+    take(source, count) {
+        const steps = [];
+        while (steps.length < count) {
+            const next = source.next();
+            if (next.done) {
+                break;
+            }
+            steps.push(next.value);
+        }
+        return steps;
+    },
+
+    supports(spec) {
+        return spec.version === this.SPEC_VERSION && typeof this[spec.generator] === 'function';
+    },
+
+    // Turn a client trace spec into the same shape as a server delta trace,
+    // with the first page of steps and the generator to pull later pages from
+    expand(spec, pageSize = this.PAGE_SIZE) {
+        const args = spec.target === undefined ? [spec.array] : [spec.array, spec.target];
+        const stepSource = this[spec.generator](...args);
+        const steps = this.take(stepSource, pageSize);
+        const done = steps.length < pageSize;
+
+        return Object.assign({}, spec, {
+            encoding: 'delta',
+            steps: steps,
+            keyframes: [],
+            trace_id: null,
+            next_cursor: done ? null : steps.length,
+            stepSource: done ? null : stepSource
+        });
+    }
+};
+
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = TraceGenerators;
+}
@@ -0,0 +1,107 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, select
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import InteractionArchive, archive_interactions  # noqa: E402
+from database import db  # noqa: E402
+from models import Interaction, Session  # noqa: E402
+from session_stats import COUNTER_COLUMNS, reconcile, record_interactions  # noqa: E402
+
+NOW = datetime(2025, 6, 1)
+EXPECTED = {
+    'a': {'interaction_count': 3, 'learn_count': 1, 'code_count': 2, 'tokens_used': 30},
+    'b': {'interaction_count': 2, 'learn_count': 0, 'code_count': 2, 'tokens_used': 20},
+}
+
+
+class CrashingConnection:
+    """A connection whose nth commit fails, as if the process died there"""
+
+    def __init__(self, connection, crash_on: int):
+        self.connection = connection
+        self.crash_on = crash_on
+        self.commits = 0
+
+    def __getattr__(self, name):
+        return getattr(self.connection, name)
+
+    def commit(self):
+        self.commits += 1
+        if self.commits == self.crash_on:
+            raise RuntimeError("crashed before commit")
+        self.connection.commit()
+
+
+@pytest.fixture
+def connection():
+    engine = create_engine('sqlite://')
+    db.metadata.create_all(engine)
+    with engine.connect() as connection:
+        records = [{
+            'session_id': session_id,
+            'user_input': f'question {number}',
+            'mentor_response': 'Let us think about it.',
+            'interaction_type': interaction_type,
+            'tokens_used': 10,
+            'created_at': NOW - timedelta(days=200, minutes=number)
+        } for number, (session_id, interaction_type) in enumerate(
+            [('a', 'code'), ('a', 'learn'), ('a', 'code'), ('b', 'code'), ('b', 'code')])]
+        connection.execute(Interaction.__table__.insert(), records)
+        record_interactions(connection, records)
+        connection.commit()
+        yield connection
+
+
+def session_counters(connection):
+    table = Session.__table__
+    return {row.session_id: {name: getattr(row, name) for name in COUNTER_COLUMNS}
+            for row in connection.execute(select(table))}
+
+
+def reconcile_with(connection, archive):
+    archive.recover(connection)
+    result = reconcile(connection, archive.session_totals())
+    connection.commit()
+    return result
+
+
+def test_crash_between_segments_and_commit_counts_rows_once(connection, tmp_path):
+    archive = InteractionArchive(root=str(tmp_path))
+    with pytest.raises(RuntimeError):
+        archive_interactions(CrashingConnection(connection, crash_on=2), archive, batch_size=2, now=NOW)
+    connection.rollback()
+
+    # The second batch is archived and still in the table
+    restarted = InteractionArchive(root=str(tmp_path))
+    assert reconcile_with(connection, restarted)['corrected'] == 0
+    assert session_counters(connection) == EXPECTED
+
+    result = archive_interactions(connection, restarted, batch_size=2, now=NOW)
+    assert result['archived'] == 3
+    assert restarted.stats()['interactions'] == 5
+    assert len(list(restarted.iter_interactions())) == 5
+    assert reconcile_with(connection, restarted)['corrected'] == 0
+    assert session_counters(connection) == EXPECTED
+
+
+def test_crash_after_commit_keeps_the_batch(connection, tmp_path, monkeypatch):
+    archive = InteractionArchive(root=str(tmp_path))
+
+    def crash(batch):
+        raise RuntimeError("crashed before marking the batch")
+
+    monkeypatch.setattr(archive, 'commit_batch', crash)
+    with pytest.raises(RuntimeError):
+        archive_interactions(connection, archive, batch_size=5, now=NOW)
+
+    # The rows left the table, so the pending batch is the only copy
+    restarted = InteractionArchive(root=str(tmp_path))
+    assert restarted.recover(connection) == {'committed': 1, 'discarded': 0}
+    assert restarted.stats()['interactions'] == 5
+    assert reconcile_with(connection, restarted)['corrected'] == 0
+    assert session_counters(connection) == EXPECTED
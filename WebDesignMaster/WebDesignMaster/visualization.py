@@ -0,0 +1,781 @@
+import base64
+import json
+import os
+import struct
+import threading
+import zlib
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from cache import BoundedCache
+from code_extraction import MAX_ARRAY_LENGTH
+
+# Delta traces carry a full snapshot of the array every this many steps (or
+# every len(array) steps for larger arrays, so snapshots never outweigh the
+# steps) letting the player seek without replaying from the start
+KEYFRAME_INTERVAL = 64
+
+TRACE_FORMAT_VERSION = 1
+
+# Version of the step vocabulary that static/js/trace_generators.js mirrors;
+# bump both together whenever a generator's steps change
+CLIENT_SPEC_VERSION = 1
+
+# Array used when the code does not contain one
+DEFAULT_ARRAY = [64, 34, 25, 12, 22, 11, 90]
+
+# Inputs students most often visualize: the default array and textbook examples
+TEXTBOOK_ARRAYS = (
+    DEFAULT_ARRAY,
+    [5, 2, 8, 1, 9],
+    [12, 11, 13, 5, 6],
+    [38, 27, 43, 3, 9, 82, 10],
+    [10, 80, 30, 90, 40, 50, 70],
+    [2, 3, 4, 10, 40],
+    [1, 3, 5, 7, 9, 11, 13, 15, 17, 19],
+)
+
+# The textbook inputs are pre-rendered in the formats the page asks for (its
+# client spec, and delta steps as the fallback) the first time a worker
+# renders a visualization; set VIS_WARM_CACHE=0 to skip that
+VIS_WARM_CACHE = os.environ.get('VIS_WARM_CACHE', '1') != '0'
+WARM_TRACE_FORMATS = ('client', 'delta')
+
+# Wire formats a client may ask for
+TRACE_FORMATS = ('delta', 'packed', 'client', 'full')
+
+# The legacy full format repeats the array on every step, so its size is
+# steps x array length; larger traces must use another format
+FULL_TRACE_MAX_CELLS = int(os.environ.get('VIS_FULL_MAX_CELLS', 250_000))
+
+# The packed format is not paged, so it is capped too; a few bytes per step
+PACKED_TRACE_MAX_STEPS = int(os.environ.get('VIS_PACKED_MAX_STEPS', 250_000))
+PACKED_MAGIC = b'VZT1'
+
+# Lazily generated traces are served in pages of this many steps
+TRACE_PAGE_SIZE = int(os.environ.get('VIS_TRACE_PAGE_SIZE', 500))
+
+# Trace ids carry the trace's input, compressed; longer ids are rejected
+# before they are decoded
+MAX_TRACE_ID_LENGTH = 16 * 1024
+MAX_TRACE_ID_PAYLOAD = 64 * 1024
+
+
+# Step generators. Each yields compact steps: array state is never copied into
+# a step, only the change it makes ('swap' exchanges its indices, 'writes'
+# lists [index, value] assignments).
+
+def bubble_sort_steps(array: List[int]) -> Iterator[Dict[str, Any]]:
+    """Generate bubble sort steps"""
+    arr = list(array)
+    n = len(arr)
+
+    for i in range(n):
+        swapped = False
+        for j in range(0, n - i - 1):
+            # Compare step
+            yield {'type': 'compare', 'indices': [j, j + 1]}
+
+            # Swap if needed
+            if arr[j] > arr[j + 1]:
+                arr[j], arr[j + 1] = arr[j + 1], arr[j]
+                yield {'type': 'swap', 'indices': [j, j + 1]}
+                swapped = True
+
+        if not swapped:
+            break
+
+    yield {'type': 'complete'}
+
+
+def selection_sort_steps(array: List[int]) -> Iterator[Dict[str, Any]]:
+    """Generate selection sort steps"""
+    arr = list(array)
+    n = len(arr)
+
+    for i in range(n):
+        min_idx = i
+        yield {'type': 'select', 'index': i}
+
+        for j in range(i + 1, n):
+            yield {'type': 'compare', 'indices': [min_idx, j]}
+            if arr[j] < arr[min_idx]:
+                min_idx = j
+                yield {'type': 'new_min', 'index': min_idx}
+
+        if min_idx != i:
+            arr[i], arr[min_idx] = arr[min_idx], arr[i]
+            yield {'type': 'swap', 'indices': [i, min_idx]}
+
+    yield {'type': 'complete'}
+
+
+def insertion_sort_steps(array: List[int]) -> Iterator[Dict[str, Any]]:
+    """Generate insertion sort steps, sinking each element left by adjacent swaps"""
+    arr = list(array)
+
+    for i in range(1, len(arr)):
+        yield {'type': 'select', 'index': i}
+
+        j = i
+        while j > 0:
+            yield {'type': 'compare', 'indices': [j - 1, j]}
+            if arr[j - 1] <= arr[j]:
+                break
+            arr[j - 1], arr[j] = arr[j], arr[j - 1]
+            yield {'type': 'swap', 'indices': [j - 1, j]}
+            j -= 1
+
+    yield {'type': 'complete'}
+
+
+def quick_sort_steps(array: List[int]) -> Iterator[Dict[str, Any]]:
+    """Generate steps for quick sort visualization"""
+    arr = list(array)
+
+    def partition(low, high):
+        pivot_index = high
+        pivot_value = arr[high]
+
+        yield {
+            'type': 'select_pivot',
+            'pivot_index': pivot_index,
+            'left': low,
+            'right': high
+        }
+
+        i = low - 1
+
+        for j in range(low, high):
+            yield {
+                'type': 'partition_compare',
+                'comparing_index': j,
+                'pivot_index': pivot_index
+            }
+
+            if arr[j] <= pivot_value:
+                i += 1
+                if i != j:
+                    arr[i], arr[j] = arr[j], arr[i]
+                    yield {'type': 'swap', 'indices': [i, j]}
+                yield {
+                    'type': 'partition_move',
+                    'element_index': i,
+                    'pivot_index': pivot_index
+                }
+            else:
+                yield {
+                    'type': 'partition_greater',
+                    'element_index': j,
+                    'pivot_index': pivot_index
+                }
+
+        # Place pivot in its final position
+        i += 1
+        if i != high:
+            arr[i], arr[high] = arr[high], arr[i]
+            yield {'type': 'swap', 'indices': [i, high]}
+
+        yield {'type': 'place_pivot', 'final_position': i}
+
+        return i
+
+    def quick_sort(low, high):
+        if low < high:
+            pi = yield from partition(low, high)
+            yield from quick_sort(low, pi - 1)
+            yield from quick_sort(pi + 1, high)
+
+    yield from quick_sort(0, len(arr) - 1)
+    yield {'type': 'complete'}
+
+
+def merge_sort_steps(array: List[int]) -> Iterator[Dict[str, Any]]:
+    """Generate steps for merge sort visualization"""
+    arr = list(array)
+
+    def merge(left, mid, right):
+        left_arr = arr[left:mid + 1]
+        right_arr = arr[mid + 1:right + 1]
+
+        # Show division
+        yield {
+            'type': 'divide',
+            'left_half': list(range(left, mid + 1)),
+            'right_half': list(range(mid + 1, right + 1))
+        }
+
+        i = j = 0
+        k = left
+        merged = []
+
+        while i < len(left_arr) and j < len(right_arr):
+            yield {
+                'type': 'merge_compare',
+                'left_index': left + i,
+                'right_index': mid + 1 + j
+            }
+
+            if left_arr[i] <= right_arr[j]:
+                value = left_arr[i]
+                i += 1
+            else:
+                value = right_arr[j]
+                j += 1
+            merged.append(value)
+            yield {
+                'type': 'merge_place',
+                'target_index': k,
+                'source_value': value,
+                'merge_range': [left, right]
+            }
+            k += 1
+
+        for value in left_arr[i:] + right_arr[j:]:
+            merged.append(value)
+            yield {
+                'type': 'merge_place',
+                'target_index': k,
+                'source_value': value,
+                'merge_range': [left, right]
+            }
+            k += 1
+
+        # Copy merged values back, recording only the positions that changed
+        writes = []
+        for offset, value in enumerate(merged):
+            if arr[left + offset] != value:
+                arr[left + offset] = value
+                writes.append([left + offset, value])
+
+        step = {'type': 'merge_complete', 'merged_range': [left, right]}
+        if writes:
+            step['writes'] = writes
+        yield step
+
+    def merge_sort(left, right):
+        if left < right:
+            mid = (left + right) // 2
+            yield from merge_sort(left, mid)
+            yield from merge_sort(mid + 1, right)
+            yield from merge(left, mid, right)
+
+    yield from merge_sort(0, len(arr) - 1)
+    yield {'type': 'complete'}
+
+
+def linear_search_steps(array: List[int], target: int) -> Iterator[Dict[str, Any]]:
+    """Generate linear search steps"""
+    for i in range(len(array)):
+        yield {'type': 'compare', 'index': i, 'value': array[i], 'target': target}
+        if array[i] == target:
+            yield {'type': 'found', 'index': i, 'value': array[i]}
+            return
+
+    yield {'type': 'not_found', 'target': target}
+
+
+def binary_search_steps(array: List[int], target: int) -> Iterator[Dict[str, Any]]:
+    """Generate binary search steps"""
+    arr = sorted(array)  # Binary search requires sorted array
+    left, right = 0, len(arr) - 1
+
+    while left <= right:
+        mid = (left + right) // 2
+        yield {'type': 'compare', 'index': mid, 'value': arr[mid], 'target': target, 'left': left, 'right': right}
+
+        if arr[mid] == target:
+            yield {'type': 'found', 'index': mid, 'value': arr[mid]}
+            return
+        elif arr[mid] < target:
+            left = mid + 1
+            yield {'type': 'eliminate_left', 'new_left': left, 'right': right}
+        else:
+            right = mid - 1
+            yield {'type': 'eliminate_right', 'left': left, 'new_right': right}
+
+    yield {'type': 'not_found', 'target': target}
+
+
+def apply_step(arr: List[int], step: Dict[str, Any]) -> bool:
+    """Apply a compact step's change to arr in place; returns True if it changed"""
+    changed = False
+    if step['type'] == 'swap':
+        i, j = step['indices']
+        arr[i], arr[j] = arr[j], arr[i]
+        changed = True
+    for index, value in step.get('writes', ()):
+        arr[index] = value
+        changed = True
+    return changed
+
+
+def encode_trace(array: List[int],
+                 steps: Iterable[Dict[str, Any]],
+                 keyframe_interval: Optional[int] = None) -> Dict[str, Any]:
+    """Build a delta trace: the initial array, compact steps and periodic keyframes.
+
+    A keyframe [index, array] is the array state before step index.
+    """
+    if keyframe_interval is None:
+        keyframe_interval = max(KEYFRAME_INTERVAL, len(array))
+    current = list(array)
+    encoded_steps = []
+    keyframes = []
+    dirty = False
+
+    for index, step in enumerate(steps):
+        if index and index % keyframe_interval == 0 and dirty:
+            keyframes.append([index, list(current)])
+            dirty = False
+        dirty = apply_step(current, step) or dirty
+        encoded_steps.append(step)
+
+    return {
+        'encoding': 'delta',
+        'version': TRACE_FORMAT_VERSION,
+        'array': list(array),
+        'steps': encoded_steps,
+        'keyframes': keyframes
+    }
+
+
+def expand_trace(trace: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a delta trace back into the legacy format with a full array on every step"""
+    current = list(trace['array'])
+    steps = []
+    for step in trace['steps']:
+        apply_step(current, step)
+        expanded = {key: value for key, value in step.items() if key != 'writes'}
+        expanded['array'] = list(current)
+        steps.append(expanded)
+    return {'array': list(trace['array']), 'steps': steps}
+
+
+# Packed binary encoding: magic, a string table of step types and field names,
+# then every value as a tagged, zigzag varint-encoded item.
+
+_TAG_INT, _TAG_LIST, _TAG_FLOAT, _TAG_NONE = range(4)
+
+
+def _write_varint(out: bytearray, value: int):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int):
+    shift = result = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _write_value(out: bytearray, value: Any):
+    if value is None:
+        out.append(_TAG_NONE)
+    elif isinstance(value, int):
+        out.append(_TAG_INT)
+        _write_varint(out, value << 1 if value >= 0 else ((-value) << 1) - 1)
+    elif isinstance(value, float):
+        out.append(_TAG_FLOAT)
+        out.extend(struct.pack('<d', value))
+    elif isinstance(value, (list, tuple)):
+        out.append(_TAG_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    else:
+        raise ValueError(f"Cannot pack value of type {type(value).__name__}")
+
+
+def _read_value(data: bytes, pos: int):
+    tag = data[pos]
+    pos += 1
+    if tag == _TAG_NONE:
+        return None, pos
+    if tag == _TAG_INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) ^ -(raw & 1), pos
+    if tag == _TAG_FLOAT:
+        return struct.unpack_from('<d', data, pos)[0], pos + 8
+    if tag == _TAG_LIST:
+        length, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(length):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    raise ValueError(f"Unknown packed value tag {tag}")
+
+
+def _write_string(out: bytearray, text: str):
+    encoded = text.encode('utf-8')
+    _write_varint(out, len(encoded))
+    out.extend(encoded)
+
+
+def _read_string(data: bytes, pos: int):
+    length, pos = _read_varint(data, pos)
+    return data[pos:pos + length].decode('utf-8'), pos + length
+
+
+def pack_trace(trace: Dict[str, Any]) -> bytes:
+    """Serialize a delta trace into the packed binary format"""
+    strings: List[str] = []
+    string_ids: Dict[str, int] = {}
+
+    def intern(text):
+        if text not in string_ids:
+            string_ids[text] = len(strings)
+            strings.append(text)
+        return string_ids[text]
+
+    body = bytearray()
+    _write_value(body, trace['array'])
+    _write_varint(body, len(trace['steps']))
+    for step in trace['steps']:
+        _write_varint(body, intern(step['type']))
+        fields = [(key, value) for key, value in step.items() if key != 'type']
+        _write_varint(body, len(fields))
+        for key, value in fields:
+            _write_varint(body, intern(key))
+            _write_value(body, value)
+    _write_value(body, trace.get('keyframes', []))
+
+    out = bytearray(PACKED_MAGIC)
+    _write_varint(out, trace.get('version', TRACE_FORMAT_VERSION))
+    _write_varint(out, len(strings))
+    for text in strings:
+        _write_string(out, text)
+    out.extend(body)
+    return bytes(out)
+
+
+def unpack_trace(data: bytes) -> Dict[str, Any]:
+    """Decode the packed binary format back into a delta trace"""
+    if data[:len(PACKED_MAGIC)] != PACKED_MAGIC:
+        raise ValueError("Not a packed visualization trace")
+
+    pos = len(PACKED_MAGIC)
+    version, pos = _read_varint(data, pos)
+    count, pos = _read_varint(data, pos)
+    strings = []
+    for _ in range(count):
+        text, pos = _read_string(data, pos)
+        strings.append(text)
+
+    array, pos = _read_value(data, pos)
+    step_count, pos = _read_varint(data, pos)
+    steps = []
+    for _ in range(step_count):
+        type_id, pos = _read_varint(data, pos)
+        step = {'type': strings[type_id]}
+        field_count, pos = _read_varint(data, pos)
+        for _ in range(field_count):
+            key_id, pos = _read_varint(data, pos)
+            step[strings[key_id]], pos = _read_value(data, pos)
+        steps.append(step)
+    keyframes, pos = _read_value(data, pos)
+
+    return {
+        'encoding': 'delta',
+        'version': version,
+        'array': array,
+        'steps': steps,
+        'keyframes': keyframes
+    }
+
+
+class TraceHandle:
+    """A lazily generated trace that can be paged through by step cursor.
+
+    Only the generator and the working array are held, so memory stays O(n)
+    however many steps the algorithm produces. Paging forward resumes the live
+    generator; seeking backwards restarts it from the initial array.
+    """
+
+    def __init__(self, generator: Callable[..., Iterator[Dict[str, Any]]], array: List[int], *args):
+        self.generator = generator
+        self.initial = list(array)
+        self.args = args
+        self._lock = threading.Lock()
+        self._restart()
+
+    def _restart(self):
+        self._steps = self.generator(self.initial, *self.args)
+        self._array = list(self.initial)
+        self._position = 0
+        self._exhausted = False
+
+    def page(self, cursor: int = 0, page_size: int = TRACE_PAGE_SIZE) -> Dict[str, Any]:
+        """Steps [cursor, cursor + page_size) plus the array state before them"""
+        with self._lock:
+            if cursor < self._position:
+                self._restart()
+
+            # Fast-forward to the cursor, keeping the array state in sync
+            while self._position < cursor:
+                step = next(self._steps, None)
+                if step is None:
+                    self._exhausted = True
+                    break
+                apply_step(self._array, step)
+                self._position += 1
+
+            start_array = list(self._array)
+            steps = [] if self._exhausted else list(islice(self._steps, page_size))
+
+            # Snapshots inside the page, at the same interval as encode_trace,
+            # so the player can seek without replaying the page from its start
+            interval = max(KEYFRAME_INTERVAL, len(self.initial))
+            keyframes = []
+            dirty = False
+            for offset, step in enumerate(steps):
+                index = cursor + offset
+                if offset and index % interval == 0 and dirty:
+                    keyframes.append([index, list(self._array)])
+                    dirty = False
+                dirty = apply_step(self._array, step) or dirty
+            self._position += len(steps)
+            if len(steps) < page_size:
+                self._exhausted = True
+
+            return {
+                'cursor': cursor,
+                'array': start_array,
+                'steps': steps,
+                'keyframes': keyframes,
+                'next_cursor': None if self._exhausted else self._position
+            }
+
+
+# Live handles of traces that did not fit in their first page, by trace id.
+# Only a shortcut: any worker can rebuild a handle from the id itself
+trace_store = BoundedCache(
+    max_entries=int(os.environ.get('VIS_TRACE_STORE_SIZE', 256)),
+    ttl=float(os.environ.get('VIS_TRACE_TTL', 900))
+)
+
+
+def encode_trace_id(algorithm: str, array: List[int], target: Optional[int] = None) -> str:
+    """URL-safe id that names a trace by its normalized input"""
+    payload = json.dumps([algorithm, array, target], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(zlib.compress(payload, 9)).decode('ascii').rstrip('=')
+
+
+def decode_trace_id(trace_id: str) -> Optional[tuple]:
+    """(algorithm, array, target) named by a trace id, or None if it is not a valid one"""
+    if len(trace_id) > MAX_TRACE_ID_LENGTH:
+        return None
+    try:
+        data = base64.urlsafe_b64decode(trace_id + '=' * (-len(trace_id) % 4))
+        decompressor = zlib.decompressobj()
+        payload = decompressor.decompress(data, MAX_TRACE_ID_PAYLOAD)
+        if decompressor.unconsumed_tail:
+            return None
+        algorithm, array, target = json.loads(payload)
+    except (ValueError, TypeError, zlib.error):
+        return None
+
+    if algorithm not in SORTING_STEPS and algorithm not in SEARCH_STEPS:
+        return None
+    if not isinstance(array, list) or len(array) > MAX_ARRAY_LENGTH or \
+            not all(type(value) is int for value in array):
+        return None
+    if target is not None and type(target) is not int:
+        return None
+    return algorithm, array, target
+
+
+def get_trace_page(trace_id: str, cursor: int = 0) -> Optional[Dict[str, Any]]:
+    """Page of a trace, or None if the id does not name one"""
+    handle = trace_store.get(trace_id)
+    if handle is None:
+        trace_input = decode_trace_id(trace_id)
+        if trace_input is None:
+            return None
+        generator, args = step_generator(*trace_input)
+        handle = TraceHandle(generator, *args)
+        trace_store.set(trace_id, handle)
+    return dict(handle.page(max(cursor, 0)), trace_id=trace_id)
+
+
+def format_trace(generator: Callable[..., Iterator[Dict[str, Any]]],
+                 array: List[int],
+                 *args,
+                 trace_format: Optional[str] = 'delta',
+                 trace_id: Optional[str] = None) -> Dict[str, Any]:
+    """Encode an algorithm's steps in the wire format requested by the client.
+
+    The default delta format is lazy: only the first page is generated, and
+    trace_id is returned for fetching the rest when there is more. The legacy
+    'full' format and the 'packed' binary format materialize the whole trace,
+    so they raise ValueError as soon as it passes their cap.
+    """
+    if trace_format in ('full', 'packed'):
+        if trace_format == 'full':
+            max_steps = FULL_TRACE_MAX_CELLS // max(len(array), 1)
+        else:
+            max_steps = PACKED_TRACE_MAX_STEPS
+        # One step past the cap is enough to know the trace is too long
+        trace = encode_trace(array, islice(generator(array, *args), max_steps + 1))
+        if len(trace['steps']) > max_steps:
+            raise ValueError(f"This trace has more than {max_steps:,} steps, too many for the {trace_format} "
+                             f"format; use trace_format 'delta'")
+        if trace_format == 'full':
+            return expand_trace(trace)
+        return {
+            'encoding': 'packed',
+            'array': trace['array'],
+            'packed': base64.b64encode(pack_trace(trace)).decode('ascii')
+        }
+
+    handle = TraceHandle(generator, array, *args)
+    page = handle.page(0)
+    if page['next_cursor'] is None:
+        trace_id = None
+    elif trace_id is not None:
+        trace_store.set(trace_id, handle)
+
+    return {
+        'encoding': 'delta',
+        'version': TRACE_FORMAT_VERSION,
+        'array': list(array),
+        'steps': page['steps'],
+        'keyframes': page['keyframes'],
+        'trace_id': trace_id,
+        'next_cursor': page['next_cursor']
+    }
+
+
+# Step generator for each sorting algorithm the classifier can name
+SORTING_STEPS = {
+    'bubble_sort': bubble_sort_steps,
+    'selection_sort': selection_sort_steps,
+    'insertion_sort': insertion_sort_steps,
+    'merge_sort': merge_sort_steps,
+    'quick_sort': quick_sort_steps
+}
+
+SEARCH_STEPS = {
+    'binary_search': binary_search_steps,
+    'linear_search': linear_search_steps
+}
+
+ALGORITHM_NAMES = {
+    'bubble_sort': 'Bubble Sort',
+    'selection_sort': 'Selection Sort',
+    'insertion_sort': 'Insertion Sort',
+    'merge_sort': 'Merge Sort',
+    'quick_sort': 'Quick Sort'
+}
+
+# Serialized visualizations of complete (single-page) traces
+trace_cache = BoundedCache(
+    max_entries=int(os.environ.get('VIS_CACHE_MAX_ENTRIES', 512)),
+    max_bytes=int(os.environ.get('VIS_CACHE_MAX_BYTES', 16 * 1024 * 1024)),
+    sizeof=len
+)
+
+
+def normalize_input(algorithm: str, array: List[int], target: Optional[int] = None):
+    """The array and target the visualization will actually use"""
+    if algorithm in SORTING_STEPS:
+        return list(array), None
+
+    if algorithm == 'binary_search':
+        array = sorted(array)
+    if target is None:
+        target = array[len(array)//2] if array else (7 if algorithm == 'binary_search' else 23)
+    return list(array), target
+
+
+def step_generator(algorithm: str, array: List[int], target: Optional[int] = None):
+    """(generator, args) producing the steps for a normalized algorithm input"""
+    if algorithm in SORTING_STEPS:
+        return SORTING_STEPS[algorithm], (array,)
+    return SEARCH_STEPS[algorithm], (array, target)
+
+
+def client_trace_spec(algorithm: str, array: List[int], target: Optional[int] = None) -> Dict[str, Any]:
+    """Everything the browser needs to generate the trace itself"""
+    spec = {'encoding': 'client', 'version': CLIENT_SPEC_VERSION, 'generator': algorithm, 'array': list(array)}
+    if algorithm in SORTING_STEPS:
+        spec['algorithm'] = ALGORITHM_NAMES[algorithm]
+    else:
+        spec['target'] = target
+    return spec
+
+
+def build_visualization(algorithm: str,
+                        array: List[int],
+                        target: Optional[int] = None,
+                        trace_format: Optional[str] = 'delta') -> Dict[str, Any]:
+    """Visualization payload for a normalized algorithm input"""
+    if trace_format == 'client':
+        return {
+            'type': 'sorting' if algorithm in SORTING_STEPS else 'searching',
+            'data': client_trace_spec(algorithm, array, target)
+        }
+
+    generator, args = step_generator(algorithm, array, target)
+    trace = format_trace(generator, *args, trace_format=trace_format,
+                         trace_id=encode_trace_id(algorithm, array, target))
+    if algorithm in SORTING_STEPS:
+        return {'type': 'sorting', 'data': dict(trace, algorithm=ALGORITHM_NAMES[algorithm])}
+    return {'type': 'searching', 'data': dict(trace, target=target)}
+
+
+def visualization_json(algorithm: str,
+                       array: List[int],
+                       target: Optional[int] = None,
+                       trace_format: Optional[str] = 'delta') -> bytes:
+    """Serialized visualization, memoized by (algorithm, array, target, format).
+
+    Longer traces carry a trace_id naming their input, so their first page
+    is cached like any other. Raises ValueError for a format not in
+    TRACE_FORMATS or a full or packed trace over its cap.
+    """
+    if trace_format not in TRACE_FORMATS:
+        raise ValueError(f"trace_format must be one of {', '.join(TRACE_FORMATS)}")
+    if VIS_WARM_CACHE and not _warmed:
+        warm_trace_cache()
+    array, target = normalize_input(algorithm, array, target)
+    key = (algorithm, tuple(array), target, trace_format)
+
+    cached = trace_cache.get(key)
+    if cached is not None:
+        return cached
+
+    visualization = build_visualization(algorithm, array, target, trace_format)
+    payload = json.dumps(visualization, separators=(',', ':')).encode('utf-8')
+    trace_cache.set(key, payload)
+    return payload
+
+
+_warm_lock = threading.Lock()
+_warmed = False
+
+
+def warm_trace_cache():
+    """Pre-render every algorithm over the textbook arrays, once per process"""
+    global _warmed
+    with _warm_lock:
+        if _warmed:
+            return
+        # Set first: the renders below go through visualization_json
+        _warmed = True
+        for trace_format in WARM_TRACE_FORMATS:
+            for array in TEXTBOOK_ARRAYS:
+                for algorithm in list(SORTING_STEPS) + list(SEARCH_STEPS):
+                    visualization_json(algorithm, array, trace_format=trace_format)
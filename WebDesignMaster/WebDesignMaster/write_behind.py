@@ -0,0 +1,171 @@
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_ENABLED = os.environ.get('WRITE_BEHIND_ENABLED', '1') != '0'
+
+# A batch is written once it has this many records or its oldest record has
+# waited this many seconds, whichever comes first
+WRITE_BEHIND_BATCH_SIZE = int(os.environ.get('WRITE_BEHIND_BATCH_SIZE', 50))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.environ.get('WRITE_BEHIND_FLUSH_INTERVAL', 0.5))
+
+# Records held while the database is failing; beyond this the oldest are dropped
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', 10000))
+
+# Rejected records kept for inspection; older ones are only counted
+DEAD_LETTER_SIZE = 100
+
+
+class WriteBehindQueue:
+    """Buffers records and writes them in batches on a background thread.
+
+    write(records) is called with up to batch_size records at a time and
+    should store them in one transaction. A failed batch is retried one
+    record at a time: a record failing with one of permanent_errors can never
+    be written, so it is moved to dead_letters; on any other error the rest
+    are kept and retried on the next flush. close() writes whatever is left;
+    register it to run at exit. With enabled=False every put is written
+    straight away.
+    """
+
+    def __init__(self, write: Callable[[List[Dict[str, Any]]], None],
+                 batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+                 flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+                 max_pending: int = WRITE_BEHIND_MAX_PENDING,
+                 enabled: bool = WRITE_BEHIND_ENABLED,
+                 name: str = 'write-behind',
+                 required: Iterable[str] = (),
+                 permanent_errors: Tuple[Type[BaseException], ...] = (ValueError, TypeError)):
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self.name = name
+        self.required = tuple(required)
+        self.permanent_errors = permanent_errors
+        self.dead_letters = deque(maxlen=DEAD_LETTER_SIZE)
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+
+        self.written = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+        self.rejected = 0
+
+    def put(self, record: Dict[str, Any]):
+        """Queue a record; raises ValueError if a required field is missing"""
+        for field in self.required:
+            if record.get(field) is None:
+                raise ValueError(f"{self.name} record has no {field}")
+
+        if not self.enabled or self._closed:
+            self._write_batch([record])
+            return
+
+        with self._condition:
+            self._pending.append(record)
+            while len(self._pending) > self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._ensure_thread()
+            if len(self._pending) >= self.batch_size:
+                self._condition.notify()
+
+    def _ensure_thread(self):
+        # Threads do not survive a fork, so each worker process starts its own
+        if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: len(self._pending) >= self.batch_size or self._closed,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+            self.flush()
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._condition:
+            batch = []
+            while self._pending and len(batch) < self.batch_size:
+                batch.append(self._pending.popleft())
+            return batch
+
+    def _write_batch(self, batch: List[Dict[str, Any]]) -> Optional[Exception]:
+        """None once the batch is written, else the error"""
+        try:
+            self.write(batch)
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"{self.name} flush error: {str(e)}")
+            return e
+        self.written += len(batch)
+        self.batches += 1
+        return None
+
+    def _reject(self, record: Dict[str, Any], error: Exception):
+        self.rejected += 1
+        self.dead_letters.append(record)
+        logger.error(f"{self.name} rejected a record that cannot be written: {str(error)}")
+
+    def flush(self):
+        """Write everything pending now, in batches; stops at the first failure that is not the record's fault"""
+        with self._write_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                error = self._write_batch(batch)
+                if error is None:
+                    continue
+
+                # Retry one record at a time so one bad record cannot hold back the rest
+                for position, record in enumerate(batch):
+                    if len(batch) > 1:
+                        error = self._write_batch([record])
+                    if error is None:
+                        continue
+                    if isinstance(error, self.permanent_errors):
+                        self._reject(record, error)
+                        continue
+                    with self._condition:
+                        # Put the unwritten records back in order for the next attempt
+                        self._pending.extendleft(reversed(batch[position:]))
+                    return
+
+    def close(self):
+        """Stop the background thread and write what is left"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            pending = len(self._pending)
+        return {
+            'pending': pending,
+            'written': self.written,
+            'batches': self.batches,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'rejected': self.rejected
+        }